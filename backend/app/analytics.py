@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import csv
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+
+# (status, reason class, google_category) -> number of candidates
+RollupKey = Tuple[str, str, str]
+Rollup = Counter
+
+# Reason prefixes written by the scraper (scraper/validator.py, scraper/rules.py).
+REASON_CLASSES: Tuple[Tuple[str, str], ...] = (
+    ("Kein Text gescrapt", "no_text"),
+    ("Keine relevanten Textstellen", "no_hits"),
+    ("AI Error", "ai_error"),
+    ("Regel:", "rule"),
+)
+# Reason classes that never reached the LLM.
+LOCAL_CLASSES = ("no_text", "no_hits", "rule")
+
+UNKNOWN = "unknown"
+
+# Per-group breakdown by google_category is capped to the biggest ones.
+TOP_GOOGLE_CATEGORIES = 25
+
+
+def reason_class(reason: Any) -> str:
+    """
+    Free-text reason -> small fixed class. Everything else is an LLM verdict.
+    """
+    text = str(reason or "").strip()
+    for prefix, cls in REASON_CLASSES:
+        if text.startswith(prefix):
+            return cls
+    return "llm"
+
+
+def rollup(records: Iterable[Mapping[str, Any]]) -> Rollup:
+    """
+    Counts per (status, reason class, google_category) for one dataset.
+    Built once per source file; everything served is derived from these counters.
+    """
+    out: Rollup = Counter()
+    for rec in records:
+        status = str(rec.get("status") or "").strip().upper() or UNKNOWN
+        gcat = str(rec.get("google_category") or "").strip() or UNKNOWN
+        out[(status, reason_class(rec.get("reason")), gcat)] += 1
+    return out
+
+
+def read_rejected_csv(path: Path) -> Rollup:
+    """
+    Rollup of one *_REJECTED.csv. Only status, reason and google_category are read.
+    Broken files count as empty, like broken JSON datasets.
+    """
+    try:
+        with path.open("r", encoding="utf-8", newline="") as f:
+            return rollup(csv.DictReader(f))
+    except (OSError, UnicodeDecodeError, csv.Error):
+        return Counter()
+
+
+def _rate(num: int, den: int) -> Optional[float]:
+    return round(num / den, 4) if den else None
+
+
+def summarize(counts: Rollup, valid: int) -> Dict[str, Any]:
+    statuses: Counter = Counter()
+    reasons: Counter = Counter()
+    for (status, cls, _), n in counts.items():
+        statuses[status] += n
+        reasons[cls] += n
+    total = sum(statuses.values())
+    llm_calls = reasons["llm"] + reasons["ai_error"]
+    return {
+        "candidates": total,
+        "valid": valid,
+        "rejected": total - valid,
+        "statuses": dict(statuses),
+        "reasons": dict(reasons),
+        "yes_rate": _rate(statuses["YES"], total),
+        # Share of candidates for which any page text was scraped.
+        "scrape_coverage": _rate(total - reasons["no_text"], total),
+        # Share of candidates decided locally (rules, no text, no relevant passages).
+        "local_rate": _rate(sum(reasons[c] for c in LOCAL_CLASSES), total),
+        "llm_error_rate": _rate(reasons["ai_error"], llm_calls),
+    }
+
+
+def _by_google_category(counts: Rollup) -> Dict[str, Dict[str, Any]]:
+    totals: Counter = Counter()
+    yes: Counter = Counter()
+    no_text: Counter = Counter()
+    for (status, cls, gcat), n in counts.items():
+        totals[gcat] += n
+        if status == "YES":
+            yes[gcat] += n
+        if cls == "no_text":
+            no_text[gcat] += n
+    return {
+        gcat: {
+            "candidates": n,
+            "yes": yes[gcat],
+            "yes_rate": _rate(yes[gcat], n),
+            "scrape_coverage": _rate(n - no_text[gcat], n),
+        }
+        for gcat, n in totals.most_common(TOP_GOOGLE_CATEGORIES)
+    }
+
+
+def valid_counts(datasets: List[Tuple[str, str, Rollup, Optional[int]]]) -> Dict[str, Dict[str, int]]:
+    """
+    Serves /api/stats: VALID records per city and category (datasets without a VALID file are left out).
+    """
+    out: Dict[str, Dict[str, int]] = {}
+    for city, category, _, valid in datasets:
+        if valid is not None:
+            out.setdefault(city, {})[category] = valid
+    return out
+
+
+def build_analytics(
+    datasets: List[Tuple[str, str, Rollup, Optional[int]]],
+) -> Dict[str, Any]:
+    """
+    Serves /api/analytics. datasets: (city, category, combined valid + rejected rollup,
+    valid count or None without a VALID file).
+    Summing the per-dataset counters is cheap; it runs once per snapshot, never per request.
+    """
+    total: Rollup = Counter()
+    total_valid = 0
+    by_category: Dict[str, Tuple[Rollup, int]] = {}
+    by_city: Dict[str, Dict[str, Any]] = {}
+
+    for city, category, counts, valid in datasets:
+        valid = valid or 0
+        total.update(counts)
+        total_valid += valid
+        cat_counts, cat_valid = by_category.get(category, (Counter(), 0))
+        cat_counts.update(counts)
+        by_category[category] = (cat_counts, cat_valid + valid)
+
+        city_entry = by_city.setdefault(city, {"_counts": Counter(), "_valid": 0, "categories": {}})
+        city_entry["_counts"].update(counts)
+        city_entry["_valid"] += valid
+        city_entry["categories"][category] = summarize(counts, valid)
+
+    cities = {}
+    for city, entry in sorted(by_city.items()):
+        cities[city] = {**summarize(entry["_counts"], entry["_valid"]), "categories": entry["categories"]}
+
+    return {
+        "totals": summarize(total, total_valid),
+        "by_category": {cat: summarize(c, v) for cat, (c, v) in sorted(by_category.items())},
+        "by_city": cities,
+        "by_google_category": _by_google_category(total),
+    }
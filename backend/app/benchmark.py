@@ -0,0 +1,266 @@
+"""
+Load test for the API with synthetic datasets.
+
+    cd backend
+    python -m app.benchmark                                  # 10x, 100x, 1000x the data/ dir
+    python -m app.benchmark --scales 100 --concurrency 32 --json bench.json
+    python -m app.benchmark --url http://localhost:8000      # running server, its own data
+
+Every scale copies each *_VALID.json (and its *_REJECTED.csv) of the current
+snapshot (CURRENT.json, else the data dir itself) factor times under new city
+names (coordinates jittered around the original city), points a fresh provider
+index at it and drives every endpoint with a fixed number of concurrent clients
+through an in-process ASGI transport. Reports p50/p95/p99 latency, throughput
+and the process RSS after each scale.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+from . import data_store
+from .data_store import FILENAME_RE, _current_source, _data_dir
+
+
+# (lat, lng, city, category) of a generated record, used to build realistic queries.
+Sample = Tuple[float, float, str, str]
+PathBuilder = Callable[[random.Random, List[Sample]], str]
+
+SEARCH_TERMS = ("labor", "dexa", "blut", "körperfett", "radiologie", "selbstzahler", "praxis", "zentrum")
+
+
+def _bbox(rng: random.Random, samples: List[Sample], half_deg: float) -> str:
+    lat, lng, _, _ = rng.choice(samples)
+    return f"{lng - half_deg:.4f},{lat - half_deg:.4f},{lng + half_deg:.4f},{lat + half_deg:.4f}"
+
+
+# Endpoint name -> request path. Randomized parameters mix cache hits and misses.
+ENDPOINTS: Dict[str, PathBuilder] = {
+    "health": lambda rng, s: "/health",
+    "datasets": lambda rng, s: "/api/datasets",
+    "stats": lambda rng, s: "/api/stats",
+    "analytics": lambda rng, s: "/api/analytics",
+    "providers_all": lambda rng, s: "/api/providers",
+    "providers_city": lambda rng, s: "/api/providers?city={}&category={}".format(*rng.choice(s)[2:]),
+    "providers_bbox": lambda rng, s: f"/api/providers?bbox={_bbox(rng, s, 0.05)}&fields=name,lat,lng,category",
+    "providers_near": lambda rng, s: "/api/providers?near={:.4f},{:.4f}&radius_km=5".format(*rng.choice(s)[:2]),
+    "providers_page": lambda rng, s: "/api/providers?limit=100&fields=name,lat,lng",
+    "providers_path": lambda rng, s: "/api/providers/{}/{}".format(*rng.choice(s)[2:]),
+    "search": lambda rng, s: f"/api/search?q={rng.choice(SEARCH_TERMS)}",
+    "clusters": lambda rng, s: f"/api/clusters?zoom={rng.randint(5, 13)}&bbox={_bbox(rng, s, 0.3)}",
+    "metrics": lambda rng, s: "/metrics",
+}
+
+
+def percentile(values: Sequence[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100.0
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def rss_mb() -> Optional[float]:
+    """
+    Current resident set size (Linux), else the peak reported by getrusage.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+def generate(src_dir: Path, out_dir: Path, factor: int, seed: int = 42) -> Tuple[int, List[Sample]]:
+    """
+    Writes factor copies of every *_VALID.json (plus its *_REJECTED.csv) from src_dir into out_dir.
+    Returns (record count, samples for query generation).
+    """
+    rng = random.Random(seed)
+    total = 0
+    samples: List[Sample] = []
+    for path in sorted(src_dir.glob("*_VALID.json")):
+        m = FILENAME_RE.match(path.name)
+        if not m:
+            continue
+        records = [r for r in json.loads(path.read_text(encoding="utf-8")) if isinstance(r, dict)]
+        category = m.group("kind").lower()
+        for i in range(factor):
+            city = m.group("city") if i == 0 else f"{m.group('city')} {i}"
+            out = []
+            for rec in records:
+                rec = dict(rec)
+                if isinstance(rec.get("lat"), (int, float)) and isinstance(rec.get("lng"), (int, float)):
+                    rec["lat"] = rec["lat"] + rng.uniform(-0.15, 0.15)
+                    rec["lng"] = rec["lng"] + rng.uniform(-0.25, 0.25)
+                    samples.append((rec["lat"], rec["lng"], city, category))
+                rec["name"] = f"{rec.get('name') or ''} {i}".strip()
+                out.append(rec)
+            (out_dir / f"{city}_{m.group('kind').upper()}_VALID.json").write_text(
+                json.dumps(out, ensure_ascii=False), encoding="utf-8"
+            )
+            rejected = path.with_name(path.name[: m.start("kind")] + f"{m.group('kind')}_REJECTED.csv")
+            if rejected.exists():
+                shutil.copyfile(rejected, out_dir / f"{city}_{m.group('kind').upper()}_REJECTED.csv")
+            total += len(out)
+    return total, samples
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    build: PathBuilder,
+    samples: List[Sample],
+    n_requests: int,
+    concurrency: int,
+    seed: int = 7,
+) -> Dict[str, Any]:
+    """
+    n_requests against one endpoint from `concurrency` concurrent workers.
+    """
+    rng = random.Random(seed)
+    paths = [build(rng, samples) for _ in range(n_requests)]
+    latencies: List[float] = []
+    errors = 0
+    queue = iter(paths)
+
+    async def worker() -> None:
+        nonlocal errors
+        for path in queue:
+            t0 = time.perf_counter()
+            res = await client.get(path, headers={"Accept-Encoding": "gzip"})
+            latencies.append(time.perf_counter() - t0)
+            if res.status_code >= 400:
+                errors += 1
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+    return {
+        "requests": n_requests,
+        "errors": errors,
+        "rps": n_requests / wall if wall else None,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+async def run_endpoints(
+    client: httpx.AsyncClient,
+    samples: List[Sample],
+    endpoints: Sequence[str],
+    n_requests: int,
+    concurrency: int,
+) -> Dict[str, Dict[str, Any]]:
+    results = {}
+    for name in endpoints:
+        results[name] = await drive(client, ENDPOINTS[name], samples, n_requests, concurrency)
+    return results
+
+
+def run_scale(factor: int, endpoints: Sequence[str], n_requests: int, concurrency: int) -> Dict[str, Any]:
+    """
+    One benchmark pass over factor x the data dir, served in-process.
+    """
+    from .main import app, response_cache
+
+    src, _ = _current_source(_data_dir())
+    with tempfile.TemporaryDirectory(prefix="laborsuche-bench-") as tmp:
+        n_records, samples = generate(src, Path(tmp), factor)
+        os.environ["DATA_DIR"] = tmp
+        data_store._index = None
+        response_cache.clear()
+        try:
+            t0 = time.perf_counter()
+            data_store.get_index()
+            load_s = time.perf_counter() - t0
+
+            async def go() -> Dict[str, Dict[str, Any]]:
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                    return await run_endpoints(client, samples, endpoints, n_requests, concurrency)
+
+            results = asyncio.run(go())
+        finally:
+            os.environ.pop("DATA_DIR", None)
+            data_store._index = None
+            response_cache.clear()
+    return {"factor": factor, "records": n_records, "load_s": load_s, "rss_mb": rss_mb(), "endpoints": results}
+
+
+def run_remote(url: str, endpoints: Sequence[str], n_requests: int, concurrency: int) -> Dict[str, Any]:
+    """
+    Same load against a running server (its data, no RSS). Query samples come from /api/providers.
+    """
+
+    async def go() -> Dict[str, Dict[str, Any]]:
+        async with httpx.AsyncClient(base_url=url, timeout=30.0) as client:
+            items = (await client.get("/api/providers", params={"fields": "lat,lng,city,category"})).json()
+            samples = [
+                (r["lat"], r["lng"], r["city"], r["category"])
+                for r in items if r.get("lat") is not None and r.get("lng") is not None
+            ]
+            return await run_endpoints(client, samples, endpoints, n_requests, concurrency)
+
+    results = asyncio.run(go())
+    return {"factor": url, "records": None, "load_s": None, "rss_mb": None, "endpoints": results}
+
+
+def print_table(runs: List[Dict[str, Any]]) -> None:
+    for run in runs:
+        rss = f"{run['rss_mb']:.0f} MB" if run["rss_mb"] is not None else "-"
+        load = f"{run['load_s']:.2f}s" if run["load_s"] is not None else "-"
+        print(f"\nscale {run['factor']}: {run['records'] or '?'} records, index load {load}, RSS {rss}")
+        print(f"{'ENDPOINT':<16} | {'RPS':>8} | {'P50_MS':>8} | {'P95_MS':>8} | {'P99_MS':>8} | {'ERR':>4}")
+        print("-" * 68)
+        for name, r in run["endpoints"].items():
+            print(
+                f"{name:<16} | {r['rps']:>8.0f} | {r['p50_ms']:>8.2f} | {r['p95_ms']:>8.2f} | "
+                f"{r['p99_ms']:>8.2f} | {r['errors']:>4}"
+            )
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load test for the Laborsuche DACH API")
+    parser.add_argument("--scales", nargs="+", type=int, default=[10, 100, 1000],
+                        help="Multiples of the data dir size")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint and scale")
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--url", help="Benchmark a running server instead of in-process scales")
+    parser.add_argument("--json", metavar="FILE", help="Also write results as JSON")
+    return parser.parse_args(argv)
+
+
+def bench(argv: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    args = parse_args(argv)
+    runs = []
+    if args.url:
+        runs.append(run_remote(args.url, args.endpoints, args.requests, args.concurrency))
+    else:
+        for factor in args.scales:
+            print(f"scale {factor}x ...", file=sys.stderr)
+            runs.append(run_scale(factor, args.endpoints, args.requests, args.concurrency))
+    print_table(runs)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(runs, f, indent=2)
+    return runs
+
+
+if __name__ == "__main__":
+    bench()
@@ -1,18 +1,48 @@
 from __future__ import annotations
 
 import json
+import logging
 import os
 import re
-from dataclasses import dataclass
-from functools import lru_cache
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from typing import Any, Dict, List, Literal, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Literal, Optional, Sequence, Tuple
+
+from .analytics import Rollup, build_analytics, read_rejected_csv, rollup, valid_counts
+from .geo import ClusterIndex, GridIndex
+from .metrics import DATA_LOAD_SECONDS, DATA_RECORDS, DATA_VERSION
+from .search import SearchIndex
+from .storage import SQLITE_FILENAME, Provider, evidence_for, materialize, read_json, read_sqlite
 
 
 Category = Literal["blood", "dexa"]
 
+logger = logging.getLogger(__name__)
+
 
 FILENAME_RE = re.compile(r"^(?P<city>.+)_(?P<kind>BLOOD|DEXA)_VALID\.json$", re.IGNORECASE)
+REJECTED_RE = re.compile(r"^(?P<city>.+)_(?P<kind>BLOOD|DEXA)_REJECTED\.csv$", re.IGNORECASE)
+
+# Minimum seconds between two filesystem checks. Requests arriving in between
+# are served straight from memory without touching the disk.
+REFRESH_INTERVAL = float(os.getenv("DATA_REFRESH_INTERVAL", "2.0"))
+
+# Published by the scraper (scraper/snapshots.py): {"version": ..., "dir": "snapshots/<version>"}.
+# Without it the data dir itself is read (legacy flat layout).
+MANIFEST_FILENAME = "CURRENT.json"
+# Built snapshots kept in memory, so a rollback to the previous version is a pointer swap.
+SNAPSHOTS_IN_MEMORY = max(1, int(os.getenv("DATA_SNAPSHOTS_IN_MEMORY", "2")))
+
+DEFAULT_RADIUS_KM = 10.0
+
+# Records serialized per step when streaming NDJSON.
+STREAM_BATCH_SIZE = 200
+
+# Fields of single providers in /api/clusters responses: enough for a marker.
+CLUSTER_POINT_FIELDS = ("name", "lat", "lng", "city", "category", "status")
 
 
 @dataclass(frozen=True)
@@ -34,6 +64,10 @@ def _normalize_category(category: str) -> Category:
     return c  # type: ignore[return-value]
 
 
+def _normalize_status(status: Any) -> str:
+    return str(status or "").strip().upper()
+
+
 def _data_dir() -> Path:
     """
     Data dir strategy:
@@ -49,66 +83,597 @@ def _data_dir() -> Path:
     return (repo_root / "data").resolve()
 
 
-def discover_datasets() -> List[DatasetKey]:
-    keys: List[DatasetKey] = []
-    for p in _data_dir().glob("*_VALID.json"):
-        m = FILENAME_RE.match(p.name)
-        if not m:
+def _parse_filename(name: str, pattern: re.Pattern = FILENAME_RE) -> Optional[DatasetKey]:
+    m = pattern.match(name)
+    if not m:
+        return None
+    city = _normalize_city(m.group("city"))
+    kind = m.group("kind").lower()
+    category: Category = "blood" if kind == "blood" else "dexa"
+    return DatasetKey(city=city, category=category)
+
+
+# Bucket key: (city_lower | None, category | None, STATUS | None); None = wildcard.
+BucketKey = Tuple[Optional[str], Optional[str], Optional[str]]
+
+# (min_lat, min_lng, max_lat, max_lng)
+BBox = Tuple[float, float, float, float]
+
+
+@dataclass
+class _SourceEntry:
+    """
+    One file in the data dir: a *_VALID.json (one dataset) or the consolidated
+    providers.sqlite (many datasets).
+    """
+
+    path: Path
+    signature: Tuple[int, int, int]  # (inode, mtime_ns, size)
+    datasets: Dict[DatasetKey, List[Provider]]
+    # Analytics counters per dataset, computed once when the file is parsed.
+    rollups: Dict[DatasetKey, Rollup] = field(default_factory=dict)
+    rejected: bool = False
+
+
+@dataclass
+class _Snapshot:
+    """
+    Immutable view over all loaded datasets. Readers grab the current snapshot
+    once and never see a half-updated index.
+    """
+
+    version: int
+    keys: List[DatasetKey]
+    datasets: Dict[Tuple[str, str], List[Provider]]
+    source: Optional[str] = None  # published snapshot version, None for the legacy layout
+    stats: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    analytics: Dict[str, Any] = field(default_factory=dict)
+    buckets: Dict[BucketKey, List[Provider]] = field(default_factory=dict)
+    geo: GridIndex = field(default_factory=lambda: GridIndex([]))
+    search: SearchIndex = field(default_factory=lambda: SearchIndex([], []))
+    clusters: ClusterIndex = field(default_factory=lambda: ClusterIndex([]))
+
+
+def _load_entry(path: Path, signature: Tuple[int, int, int]) -> _SourceEntry:
+    if REJECTED_RE.match(path.name):
+        key = _parse_filename(path.name, REJECTED_RE)
+        rollups = {key: read_rejected_csv(path)} if key is not None else {}
+        return _SourceEntry(path=path, signature=signature, datasets={}, rollups=rollups, rejected=True)
+    datasets = _load_source(path)
+    rollups = {key: rollup(records) for key, records in datasets.items()}
+    return _SourceEntry(path=path, signature=signature, datasets=datasets, rollups=rollups)
+
+
+def _load_source(path: Path) -> Dict[DatasetKey, List[Provider]]:
+    if path.name == SQLITE_FILENAME:
+        out: Dict[DatasetKey, List[Provider]] = {}
+        for (city, category), records in read_sqlite(path).items():
+            try:
+                key = DatasetKey(city=_normalize_city(city), category=_normalize_category(category))
+            except ValueError:
+                continue
+            out[key] = records
+        return out
+
+    key = _parse_filename(path.name)
+    if key is None:
+        return {}
+    return {key: read_json(path, key.city, key.category)}
+
+
+def _read_manifest(data_dir: Path) -> Optional[Dict[str, Any]]:
+    try:
+        manifest = json.loads((data_dir / MANIFEST_FILENAME).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(manifest, dict) or not manifest.get("version") or not manifest.get("dir"):
+        return None
+    return manifest
+
+
+def _current_source(data_dir: Path) -> Tuple[Path, Optional[str]]:
+    """
+    (directory of the published snapshot, its version); the data dir itself without a manifest.
+    """
+    manifest = _read_manifest(data_dir)
+    if manifest is None:
+        return data_dir, None
+    return (data_dir / manifest["dir"]).resolve(), str(manifest["version"])
+
+
+def _build_snapshot(entries: Dict[Path, _SourceEntry], version: int, source: Optional[str] = None) -> _Snapshot:
+    # The consolidated SQLite store wins over a JSON file for the same dataset.
+    chosen: Dict[Tuple[str, str], Tuple[DatasetKey, List[Provider]]] = {}
+    valid_rollups: Dict[Tuple[str, str], Rollup] = {}
+    rejected_rollups: Dict[Tuple[str, str], Tuple[DatasetKey, Rollup]] = {}
+    for e in sorted(entries.values(), key=lambda e: e.path.name == SQLITE_FILENAME):
+        if e.rejected:
+            for key, counts in e.rollups.items():
+                rejected_rollups[(key.city.lower(), key.category)] = (key, counts)
             continue
-        city = _normalize_city(m.group("city"))
-        kind = m.group("kind").lower()
-        category: Category = "blood" if kind == "blood" else "dexa"
-        keys.append(DatasetKey(city=city, category=category))
-    keys.sort(key=lambda k: (k.city.lower(), k.category))
-    return keys
+        for key, records in e.datasets.items():
+            chosen[(key.city.lower(), key.category)] = (key, records)
+            valid_rollups[(key.city.lower(), key.category)] = e.rollups[key]
+
+    keys: List[DatasetKey] = []
+    datasets: Dict[Tuple[str, str], List[Provider]] = {}
+    buckets: Dict[BucketKey, List[Provider]] = {}
+    for ident in sorted(chosen):
+        key, records = chosen[ident]
+        keys.append(key)
+        datasets[ident] = records
+        city_l, category = ident
+        for rec in records:
+            status = _normalize_status(rec.status)
+            # Every record lands in all 8 wildcard combinations, so any
+            # (city, category, status) filter is a single dict lookup.
+            for c in (city_l, None):
+                for k in (category, None):
+                    for s in (status, None):
+                        buckets.setdefault((c, k, s), []).append(rec)
+
+    all_records = buckets.get((None, None, None), [])
+    geo = GridIndex(all_records)
+    search = SearchIndex(all_records, evidence_for(all_records))
+    clusters = ClusterIndex(all_records, group=lambda rec: (rec.category, _normalize_status(rec.status)))
+
+    # Only the per-file counters are summed here; no record is looked at again.
+    rollups = []
+    for ident in sorted(set(chosen) | set(rejected_rollups)):
+        key = chosen[ident][0] if ident in chosen else rejected_rollups[ident][0]
+        counts = valid_rollups.get(ident, Counter()) + rejected_rollups.get(ident, (key, Counter()))[1]
+        rollups.append((key.city, key.category, counts, len(chosen[ident][1]) if ident in chosen else None))
+
+    return _Snapshot(
+        version=version, keys=keys, datasets=datasets, source=source,
+        stats=valid_counts(rollups), analytics=build_analytics(rollups),
+        buckets=buckets, geo=geo, search=search, clusters=clusters,
+    )
+
+
+def _matches(rec: Provider, bucket: BucketKey) -> bool:
+    city_l, category, status = bucket
+    if city_l is not None and rec.city.lower() != city_l:
+        return False
+    if category is not None and rec.category != category:
+        return False
+    if status is not None and _normalize_status(rec.status) != status:
+        return False
+    return True
+
+
+class ProviderIndex:
+    """
+    In-memory index over all *_VALID.json files and the consolidated
+    providers.sqlite of the current data snapshot.
+
+    The scraper publishes immutable snapshot directories and flips CURRENT.json
+    (see scraper/snapshots.py); without a manifest the data dir itself is read.
+    A new index is built off the request path and published with a single
+    reference swap, so readers never block and never see partial data.
+    A file is re-parsed only when its inode, mtime or size changes; files
+    hard-linked into the next snapshot are reused without parsing.
+    """
+
+    def __init__(self, data_dir: Optional[Path] = None, refresh_interval: float = REFRESH_INTERVAL) -> None:
+        self._data_dir = data_dir
+        self._refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._entries: Dict[Path, _SourceEntry] = {}
+        self._source_dir: Optional[Path] = None
+        self._dir_mtime_ns: Optional[int] = None
+        self._last_check = 0.0
+        self._snapshot = _Snapshot(version=0, keys=[], datasets={})
+        # Recently served snapshots by source version: (snapshot, entries, source dir)
+        self._recent: "OrderedDict[str, Tuple[_Snapshot, Dict[Path, _SourceEntry], Path]]" = OrderedDict()
+        self._watcher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @property
+    def data_dir(self) -> Path:
+        return self._data_dir or _data_dir()
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    @property
+    def source(self) -> Optional[str]:
+        return self._snapshot.source
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Checks the data dir for changes and rebuilds the index if needed.
+        Returns True if a new snapshot was published.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_check < self._refresh_interval:
+            return False
+
+        with self._lock:
+            if not force and now - self._last_check < self._refresh_interval:
+                return False
+            self._last_check = now
+            return self._sync()
+
+    def start_watcher(self) -> None:
+        """
+        Polls for new snapshots in a background thread. Requests then only read
+        the current snapshot and never wait for a rebuild.
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, name="provider-index-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self._refresh_interval):
+            try:
+                self.refresh(force=True)
+            except Exception:
+                # Keep serving the last good snapshot; the next poll tries again.
+                logger.exception("Refreshing the provider index failed")
+
+    def _resolve_source(self) -> Tuple[Path, Optional[str]]:
+        return _current_source(self.data_dir)
+
+    def _sync(self) -> bool:
+        source_dir, source = self._resolve_source()
+
+        # Rollback (or flip back and forth) to a snapshot that is still in memory.
+        if source is not None and source != self._snapshot.source and source in self._recent:
+            snap, entries, cached_dir = self._recent[source]
+            self._publish(replace(snap, version=self._snapshot.version + 1), entries, cached_dir, None)
+            return True
+
+        try:
+            dir_mtime_ns = source_dir.stat().st_mtime_ns
+        except OSError:
+            dir_mtime_ns = None
+
+        # The directory listing only changes when files are added, removed or
+        # renamed into place. In-place rewrites are caught by the per-file stat.
+        if dir_mtime_ns is None:
+            paths: List[Path] = []
+        elif dir_mtime_ns != self._dir_mtime_ns or source_dir != self._source_dir or not self._entries:
+            paths = [p for p in source_dir.glob("*_VALID.json") if FILENAME_RE.match(p.name)]
+            paths += [p for p in source_dir.glob("*_REJECTED.csv") if REJECTED_RE.match(p.name)]
+            sqlite_path = source_dir / SQLITE_FILENAME
+            if sqlite_path.exists():
+                paths.append(sqlite_path)
+        else:
+            paths = list(self._entries.keys())
+
+        # Unchanged files are hard-linked from one snapshot into the next: same
+        # inode under a new path, so the parsed datasets can be reused.
+        by_signature = {(p.name, e.signature): e for p, e in self._entries.items()}
+
+        changed = source_dir != self._source_dir
+        entries: Dict[Path, _SourceEntry] = {}
+        for p in paths:
+            try:
+                st = p.stat()
+            except OSError:
+                changed = True
+                continue
+            signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+            old = self._entries.get(p)
+            if old is not None and old.signature == signature:
+                entries[p] = old
+                continue
+            linked = by_signature.get((p.name, signature))
+            if linked is not None and p.name != SQLITE_FILENAME:
+                entries[p] = replace(linked, path=p)
+                changed = True
+                continue
+            t0 = time.perf_counter()
+            entries[p] = _load_entry(p, signature)
+            DATA_LOAD_SECONDS.observe(time.perf_counter() - t0, stage="parse")
+            changed = True
+
+        if set(entries) != set(self._entries):
+            changed = True
+
+        if not changed and self._snapshot.version > 0:
+            self._dir_mtime_ns = dir_mtime_ns
+            return False
+
+        t0 = time.perf_counter()
+        snap = _build_snapshot(entries, self._snapshot.version + 1, source)
+        DATA_LOAD_SECONDS.observe(time.perf_counter() - t0, stage="build")
+        self._publish(snap, entries, source_dir, dir_mtime_ns)
+        return True
+
+    def _publish(
+        self,
+        snap: _Snapshot,
+        entries: Dict[Path, _SourceEntry],
+        source_dir: Path,
+        dir_mtime_ns: Optional[int],
+    ) -> None:
+        self._entries = entries
+        self._source_dir = source_dir
+        self._dir_mtime_ns = dir_mtime_ns
+        # The single reference swap readers observe.
+        self._snapshot = snap
+        if snap.source is not None:
+            self._recent[snap.source] = (snap, entries, source_dir)
+            self._recent.move_to_end(snap.source)
+            while len(self._recent) > SNAPSHOTS_IN_MEMORY:
+                self._recent.popitem(last=False)
+        DATA_VERSION.set(snap.version)
+        DATA_RECORDS.set(len(snap.buckets.get((None, None, None), [])))
+
+    def poll(self) -> None:
+        """
+        Inline refresh for callers without a running watcher (scripts, tests).
+        """
+        if self._watcher is None:
+            self.refresh()
+
+    def _current(self) -> _Snapshot:
+        self.poll()
+        return self._snapshot
+
+    def datasets(self) -> List[DatasetKey]:
+        return list(self._current().keys)
+
+    def dataset(self, city: str, category: str) -> List[Provider]:
+        cat = _normalize_category(category)
+        return self._current().datasets.get((_normalize_city(city).lower(), cat), [])
+
+    @staticmethod
+    def _bucket(city: Optional[str], category: Optional[str], status: Optional[str]) -> BucketKey:
+        return (
+            _normalize_city(city).lower() if city else None,
+            _normalize_category(category) if category else None,
+            _normalize_status(status) if status else None,
+        )
+
+    def query(
+        self,
+        city: Optional[str] = None,
+        category: Optional[str] = None,
+        status: Optional[str] = None,
+        bbox: Optional[BBox] = None,
+    ) -> List[Provider]:
+        """
+        Attribute filters are a bucket lookup. With bbox the grid index is
+        queried first and the (small) hit list is filtered.
+        The returned list is shared with the index and must not be mutated.
+        """
+        bucket = self._bucket(city, category, status)
+        snap = self._current()
+        if bbox is None:
+            return snap.buckets.get(bucket, [])
+        return [p[3] for p in snap.geo.within_bbox(*bbox) if _matches(p[3], bucket)]
+
+    def query_near(
+        self,
+        lat: float,
+        lng: float,
+        radius_km: Optional[float] = None,
+        city: Optional[str] = None,
+        category: Optional[str] = None,
+        status: Optional[str] = None,
+        bbox: Optional[BBox] = None,
+    ) -> List[Tuple[float, Provider]]:
+        """
+        (distance_km, record) pairs within radius_km, nearest first.
+        """
+        bucket = self._bucket(city, category, status)
+        hits = self._current().geo.within_radius(lat, lng, radius_km or DEFAULT_RADIUS_KM)
+        out: List[Tuple[float, Provider]] = []
+        for dist, (plat, plng, _, rec) in hits:
+            if bbox is not None and not (bbox[0] <= plat <= bbox[2] and bbox[1] <= plng <= bbox[3]):
+                continue
+            if _matches(rec, bucket):
+                out.append((dist, rec))
+        return out
+
+    def clusters(
+        self,
+        zoom: int,
+        bbox: Optional[BBox] = None,
+        category: Optional[str] = None,
+        status: Optional[str] = None,
+    ) -> Tuple[List[Dict[str, Any]], List[Provider]]:
+        """
+        (clusters, single providers) in view at a map zoom level.
+
+        Up to the deepest cluster level this reads the precomputed cells only;
+        a cell holding a single matching provider comes back as that provider.
+        Beyond it every provider in the box is returned individually.
+        """
+        _, cat, st = self._bucket(None, category, status)
+        snap = self._current()
+        if zoom > snap.clusters.max_zoom:
+            return [], self.query(category=category, status=status, bbox=bbox)
+
+        cells = snap.clusters.cells(zoom, *bbox) if bbox is not None else snap.clusters.cells(zoom)
+        clusters: List[Dict[str, Any]] = []
+        points: List[Provider] = []
+        for cell in cells:
+            count = 0
+            sum_lat = sum_lng = 0.0
+            single: Optional[Provider] = None
+            categories: Dict[str, int] = {}
+            statuses: Dict[str, int] = {}
+            for (g_cat, g_status), (n, slat, slng, rec) in cell.items():
+                if (cat is not None and g_cat != cat) or (st is not None and g_status != st):
+                    continue
+                count += n
+                sum_lat += slat
+                sum_lng += slng
+                single = rec
+                categories[g_cat] = categories.get(g_cat, 0) + n
+                statuses[g_status] = statuses.get(g_status, 0) + n
+            if count == 1 and single is not None:
+                points.append(single)
+            elif count:
+                clusters.append({
+                    "lat": round(sum_lat / count, 5),
+                    "lng": round(sum_lng / count, 5),
+                    "count": count,
+                    "categories": categories,
+                    "statuses": statuses,
+                })
+        return clusters, points
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        VALID records per city and category of the current snapshot.
+        """
+        return self._current().stats
+
+    def analytics(self) -> Dict[str, Any]:
+        """
+        Precomputed analytics of the current snapshot (see analytics.build_analytics).
+        """
+        return self._current().analytics
+
+    def search(
+        self,
+        q: str,
+        city: Optional[str] = None,
+        category: Optional[str] = None,
+        status: Optional[str] = None,
+    ) -> List[Tuple[float, Provider]]:
+        """
+        (score, record) pairs for a full-text query, best first.
+        """
+        bucket = self._bucket(city, category, status)
+        return [(score, rec) for score, rec in self._current().search.search(q) if _matches(rec, bucket)]
+
+
+_index: Optional[ProviderIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> ProviderIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                idx = ProviderIndex()
+                idx.refresh(force=True)
+                _index = idx
+    return _index
+
+
+def discover_datasets() -> List[DatasetKey]:
+    return get_index().datasets()
 
 
-@lru_cache(maxsize=128)
 def load_dataset(city: str, category: str) -> List[Dict[str, Any]]:
-    city_n = _normalize_city(city)
-    cat = _normalize_category(category)
+    """
+    Records of one city/category, annotated with city + category.
+    """
+    return materialize(get_index().dataset(city, category))
 
-    # Find matching file by parsing filenames (case-insensitive city match).
-    target_kind = "BLOOD" if cat == "blood" else "DEXA"
-    candidates = list(_data_dir().glob(f"*_{target_kind}_VALID.json"))
 
-    target_file: Optional[Path] = None
-    for p in candidates:
-        m = FILENAME_RE.match(p.name)
-        if not m:
-            continue
-        file_city = _normalize_city(m.group("city"))
-        if file_city.lower() == city_n.lower():
-            target_file = p
-            break
+def query_records(
+    city: Optional[str] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    bbox: Optional[BBox] = None,
+    near: Optional[Tuple[float, float]] = None,
+    radius_km: Optional[float] = None,
+) -> Tuple[List[Provider], Optional[List[float]]]:
+    """
+    Matching records plus their distances (only for near queries, else None).
+    Nothing is serialized yet, so callers can page before paying for it.
+    """
+    idx = get_index()
+    if near is None:
+        return idx.query(city=city, category=category, status=status, bbox=bbox), None
 
-    if not target_file:
-        return []
+    hits = idx.query_near(
+        near[0], near[1], radius_km, city=city, category=category, status=status, bbox=bbox
+    )
+    return [rec for _, rec in hits], [dist for dist, _ in hits]
 
-    with target_file.open("r", encoding="utf-8") as f:
-        data = json.load(f)
 
-    # Expect list; if not, return empty to avoid frontend breakage.
-    return data if isinstance(data, list) else []
+def query_clusters(
+    zoom: int,
+    bbox: Optional[BBox] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Map markers for one zoom level: aggregated clusters plus single providers
+    projected to a few marker fields.
+    """
+    clusters, points = get_index().clusters(zoom, bbox, category=category, status=status)
+    return {
+        "zoom": zoom,
+        "clusters": clusters,
+        "points": materialize(points, fields=fields or CLUSTER_POINT_FIELDS),
+    }
 
 
-def load_all(city: Optional[str] = None, category: Optional[str] = None) -> List[Dict[str, Any]]:
-    keys = discover_datasets()
+def to_dicts(
+    records: List[Provider],
+    distances: Optional[List[float]] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> List[Dict[str, Any]]:
+    out = materialize(records, fields=fields)
+    if distances is not None and (fields is None or "distance_km" in fields):
+        for dist, item in zip(distances, out):
+            item["distance_km"] = round(dist, 3)
+    return out
 
-    out: List[Dict[str, Any]] = []
-    for k in keys:
-        if city and k.city.lower() != city.strip().lower():
-            continue
-        if category and k.category != _normalize_category(category):
-            continue
 
-        items = load_dataset(k.city, k.category)
-        # Add category + city for frontend filtering and marker styling
-        for item in items:
-            if isinstance(item, dict):
-                item = dict(item)
-                item["city"] = k.city
-                item["category"] = k.category
-                out.append(item)
+def iter_dicts(
+    records: List[Provider],
+    distances: Optional[List[float]] = None,
+    fields: Optional[Sequence[str]] = None,
+    batch_size: int = STREAM_BATCH_SIZE,
+) -> Iterator[Dict[str, Any]]:
+    """
+    Like to_dicts, but produces records batch by batch for streaming responses.
+    """
+    for i in range(0, len(records), batch_size):
+        chunk_dist = distances[i:i + batch_size] if distances is not None else None
+        yield from to_dicts(records[i:i + batch_size], chunk_dist, fields)
+
 
+def load_all(
+    city: Optional[str] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    bbox: Optional[BBox] = None,
+    near: Optional[Tuple[float, float]] = None,
+    radius_km: Optional[float] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Filtered view over all datasets as response dicts.
+    near results are sorted by distance and carry an extra distance_km field.
+    """
+    records, distances = query_records(city, category, status, bbox, near, radius_km)
+    return to_dicts(records, distances, fields)
+
+
+def search(
+    q: str,
+    city: Optional[str] = None,
+    category: Optional[str] = None,
+    limit: int = 20,
+) -> List[Dict[str, Any]]:
+    """
+    Ranked full-text hits as response dicts with an extra score field.
+    """
+    hits = get_index().search(q, city=city, category=category)[:limit]
+    out = materialize([rec for _, rec in hits])
+    for (score, _), item in zip(hits, out):
+        item["score"] = round(score, 4)
     return out
@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG_LAT = 111.32
+
+# 0.05° ≈ 5.5 km north-south, ~3.5 km east-west in the DACH region.
+# A city viewport touches a handful of cells, a single cell holds a few dozen points.
+DEFAULT_CELL_DEG = 0.05
+
+Point = Tuple[float, float, int, Dict[str, Any]]  # (lat, lng, position, record)
+
+
+def to_latlng(record: Dict[str, Any]) -> Optional[Tuple[float, float]]:
+    try:
+        lat = float(record.get("lat"))  # type: ignore[arg-type]
+        lng = float(record.get("lng"))  # type: ignore[arg-type]
+    except (TypeError, ValueError):
+        return None
+    if not (math.isfinite(lat) and math.isfinite(lng)):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lng <= 180.0):
+        return None
+    return lat, lng
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1 = math.radians(lat1)
+    p2 = math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GridIndex:
+    """
+    Fixed-size lat/lng grid over provider coordinates.
+
+    Lookups only visit the cells overlapping the query box, so cost depends
+    on the size of the viewport, not on the total number of providers.
+    Records without usable coordinates are not indexed.
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]], cell_deg: float = DEFAULT_CELL_DEG) -> None:
+        self.cell_deg = cell_deg
+        self.cells: Dict[Tuple[int, int], List[Point]] = {}
+        self.size = 0
+        for pos, rec in enumerate(records):
+            ll = to_latlng(rec)
+            if ll is None:
+                continue
+            lat, lng = ll
+            self.cells.setdefault(self._cell(lat, lng), []).append((lat, lng, pos, rec))
+            self.size += 1
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lng / self.cell_deg))
+
+    def _points_in(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> Iterable[Point]:
+        y0, x0 = self._cell(min_lat, min_lng)
+        y1, x1 = self._cell(max_lat, max_lng)
+        n_cells = (y1 - y0 + 1) * (x1 - x0 + 1)
+
+        # Large boxes (zoomed-out map) cover more grid cells than are occupied:
+        # walk the occupied cells instead of the empty grid.
+        if n_cells > len(self.cells):
+            for (y, x), pts in self.cells.items():
+                if y0 <= y <= y1 and x0 <= x <= x1:
+                    yield from pts
+            return
+
+        for y in range(y0, y1 + 1):
+            for x in range(x0, x1 + 1):
+                pts = self.cells.get((y, x))
+                if pts:
+                    yield from pts
+
+    def within_bbox(self, min_lat: float, min_lng: float, max_lat: float, max_lng: float) -> List[Point]:
+        """
+        Points inside the box, in original record order.
+        """
+        out = [
+            p for p in self._points_in(min_lat, min_lng, max_lat, max_lng)
+            if min_lat <= p[0] <= max_lat and min_lng <= p[1] <= max_lng
+        ]
+        out.sort(key=lambda p: p[2])
+        return out
+
+    def within_radius(self, lat: float, lng: float, radius_km: float) -> List[Tuple[float, Point]]:
+        """
+        Points within radius_km of (lat, lng) as (distance_km, point), nearest first.
+        """
+        dlat = radius_km / KM_PER_DEG_LAT
+        dlng = radius_km / (KM_PER_DEG_LAT * max(math.cos(math.radians(lat)), 1e-6))
+        out: List[Tuple[float, Point]] = []
+        for p in self._points_in(lat - dlat, lng - dlng, lat + dlat, lng + dlng):
+            d = haversine_km(lat, lng, p[0], p[1])
+            if d <= radius_km:
+                out.append((d, p))
+        out.sort(key=lambda t: (t[0], t[1][2]))
+        return out
+
+
+# Marker clustering (supercluster-style): one grid per zoom level in Web
+# Mercator space. A cell is CLUSTER_CELL_PX screen pixels wide at its zoom, so
+# a viewport touches the same few hundred cells at every zoom level.
+CLUSTER_CELL_PX = 64
+TILE_PX = 256
+# Deepest clustered level; beyond it the map shows individual providers.
+CLUSTER_MAX_ZOOM = 14
+MAX_MERCATOR_LAT = 85.05112878
+
+ClusterCell = Dict[Any, List[Any]]  # group -> [count, sum_lat, sum_lng, record if count == 1]
+
+
+def to_mercator(lat: float, lng: float) -> Tuple[float, float]:
+    """
+    (lat, lng) -> (x, y) in [0, 1], y growing southwards like map tiles.
+    """
+    s = math.sin(math.radians(min(max(lat, -MAX_MERCATOR_LAT), MAX_MERCATOR_LAT)))
+    x = min(max((lng + 180.0) / 360.0, 0.0), 1.0)
+    y = 0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)
+    return x, min(max(y, 0.0), 1.0)
+
+
+def _cells_per_axis(zoom: int) -> int:
+    return (TILE_PX // CLUSTER_CELL_PX) << zoom
+
+
+class ClusterIndex:
+    """
+    Hierarchical cluster grids for zoom levels 0..max_zoom.
+
+    The deepest level is built from the points, every coarser level by merging
+    2x2 child cells, so a build costs O(n * levels) once per snapshot and a
+    query only touches the cells in view. Each cell keeps count and coordinate
+    sums per group (e.g. (category, status)) so filtered counts and centroids
+    need no second pass over the points.
+    """
+
+    def __init__(
+        self,
+        records: Iterable[Dict[str, Any]],
+        group: Callable[[Dict[str, Any]], Any] = lambda rec: None,
+        max_zoom: int = CLUSTER_MAX_ZOOM,
+    ) -> None:
+        self.max_zoom = max_zoom
+        self.levels: List[Dict[Tuple[int, int], ClusterCell]] = [{} for _ in range(max_zoom + 1)]
+
+        n = _cells_per_axis(max_zoom)
+        leaf = self.levels[max_zoom]
+        for rec in records:
+            ll = to_latlng(rec)
+            if ll is None:
+                continue
+            lat, lng = ll
+            x, y = to_mercator(lat, lng)
+            key = (min(int(x * n), n - 1), min(int(y * n), n - 1))
+            _add(leaf.setdefault(key, {}), group(rec), 1, lat, lng, rec)
+
+        for zoom in range(max_zoom - 1, -1, -1):
+            parent = self.levels[zoom]
+            for (cx, cy), cell in self.levels[zoom + 1].items():
+                target = parent.setdefault((cx >> 1, cy >> 1), {})
+                for g, (count, slat, slng, rec) in cell.items():
+                    _add(target, g, count, slat, slng, rec)
+
+    def cells(
+        self,
+        zoom: int,
+        min_lat: float = -90.0,
+        min_lng: float = -180.0,
+        max_lat: float = 90.0,
+        max_lng: float = 180.0,
+    ) -> List[ClusterCell]:
+        """
+        Cells of one zoom level overlapping the box, west to east, north to south.
+        """
+        zoom = min(max(zoom, 0), self.max_zoom)
+        level = self.levels[zoom]
+        n = _cells_per_axis(zoom)
+        x0, y0 = to_mercator(max_lat, min_lng)
+        x1, y1 = to_mercator(min_lat, max_lng)
+        x0, x1 = int(x0 * n), min(int(x1 * n), n - 1)
+        y0, y1 = int(y0 * n), min(int(y1 * n), n - 1)
+
+        # Same trick as GridIndex: walk occupied cells when the box covers more.
+        if (x1 - x0 + 1) * (y1 - y0 + 1) > len(level):
+            keys = sorted(
+                (k for k in level if x0 <= k[0] <= x1 and y0 <= k[1] <= y1),
+                key=lambda k: (k[1], k[0]),
+            )
+            return [level[k] for k in keys]
+
+        out: List[ClusterCell] = []
+        for cy in range(y0, y1 + 1):
+            for cx in range(x0, x1 + 1):
+                cell = level.get((cx, cy))
+                if cell is not None:
+                    out.append(cell)
+        return out
+
+
+def _add(cell: ClusterCell, group: Any, count: int, slat: float, slng: float, rec: Any) -> None:
+    entry = cell.get(group)
+    if entry is None:
+        cell[group] = [count, slat, slng, rec]
+        return
+    entry[0] += count
+    entry[1] += slat
+    entry[2] += slng
+    entry[3] = None
@@ -1,15 +1,43 @@
 from __future__ import annotations
 
-from fastapi import FastAPI, Query
+import base64
+import json
+import re
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Any, Dict, List, Optional, Literal
+from typing import Any, Callable, Dict, List, Optional, Literal, Tuple, Union
+
+from .data_store import (
+    discover_datasets,
+    get_index,
+    iter_dicts,
+    load_dataset,
+    query_clusters,
+    query_records,
+    search as search_providers,
+    to_dicts,
+)
+from .metrics import TimingMiddleware, render as render_metrics
+from .response_cache import ResponseCache, request_key, respond
 
-from .data_store import discover_datasets, load_all, load_dataset
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the provider index once before the first request comes in,
+    # then pick up newly published snapshots in the background.
+    index = get_index()
+    index.start_watcher()
+    yield
+    index.stop_watcher()
 
 
 app = FastAPI(
     title="Laborsuche DACH API",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -23,66 +51,221 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
+app.add_middleware(TimingMiddleware)
+
+response_cache = ResponseCache()
+
+
+def _cached_json(request: Request, build: Callable[[], Any]) -> Response:
+    """
+    Serves the response body from the cache for the current data version,
+    building and serializing it only on a miss. Honors If-None-Match.
+    """
+    index = get_index()
+    index.poll()
+    entry = response_cache.get_or_build(request_key(request), index.version, build)
+    return respond(request, entry)
+
+
+def _parse_floats(raw: str, n: int, name: str) -> Tuple[float, ...]:
+    try:
+        values = tuple(float(x) for x in raw.split(","))
+    except ValueError:
+        values = ()
+    if len(values) != n:
+        raise HTTPException(status_code=400, detail=f"{name} must be {n} comma-separated numbers")
+    return values
+
+
+def _parse_bbox(raw: Optional[str]) -> Optional[Tuple[float, float, float, float]]:
+    # Same order as Leaflet's LatLngBounds.toBBoxString(): west,south,east,north
+    if not raw:
+        return None
+    west, south, east, north = _parse_floats(raw, 4, "bbox")
+    if south > north or west > east:
+        raise HTTPException(status_code=400, detail="bbox must be west,south,east,north")
+    return south, west, north, east
+
+
+def _parse_near(raw: Optional[str]) -> Optional[Tuple[float, float]]:
+    if not raw:
+        return None
+    lat, lng = _parse_floats(raw, 2, "near")
+    return lat, lng
+
+
+_FIELD_RE = re.compile(r"^[a-z_]+$")
+
+
+def _parse_fields(raw: Optional[str]) -> Optional[List[str]]:
+    if not raw:
+        return None
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    bad = [f for f in fields if not _FIELD_RE.match(f)]
+    if bad or not fields:
+        raise HTTPException(status_code=400, detail=f"Invalid fields: {', '.join(bad) or raw}")
+    return fields
+
+
+def _encode_cursor(version: int, offset: int) -> str:
+    raw = json.dumps({"v": version, "o": offset}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: Optional[str], version: int) -> int:
+    """
+    Cursor -> offset. A cursor from an older data version is rejected (409)
+    instead of silently skipping or repeating records.
+    """
+    if not cursor:
+        return 0
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        v, offset = int(data["v"]), int(data["o"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if v != version:
+        raise HTTPException(status_code=409, detail="Data changed since this cursor was issued; restart pagination")
+    return max(0, offset)
 
 
 @app.get("/health")
-def health() -> Dict[str, str]:
-    return {"status": "ok"}
+def health() -> Dict[str, Any]:
+    index = get_index()
+    return {"status": "ok", "data_version": index.version, "snapshot": index.source}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics() -> str:
+    """
+    Prometheus text format: per-route latency histograms and data-load timings.
+    """
+    return render_metrics()
 
 
-@app.get("/api/datasets")
-def datasets() -> List[Dict[str, str]]:
+@app.get("/api/datasets", response_model=List[Dict[str, str]])
+def datasets(request: Request) -> Response:
     """
     Returns which city/category datasets exist based on filenames.
     """
-    return [{"city": k.city, "category": k.category} for k in discover_datasets()]
+    return _cached_json(request, lambda: [{"city": k.city, "category": k.category} for k in discover_datasets()])
 
 
-@app.get("/api/providers")
+@app.get("/api/providers", response_model=Union[List[Dict[str, Any]], Dict[str, Any]])
 def providers(
+    request: Request,
     city: Optional[str] = Query(default=None, description="e.g. Berlin, Wien, Zurich"),
     category: Optional[Literal["blood", "dexa"]] = Query(default=None),
     status: Optional[str] = Query(default=None, description="Optional: YES/NO/QUESTIONABLE"),
-) -> List[Dict[str, Any]]:
+    bbox: Optional[str] = Query(default=None, description="west,south,east,north (e.g. 13.2,52.4,13.6,52.6)"),
+    near: Optional[str] = Query(default=None, description="lat,lng (e.g. 52.52,13.40)"),
+    radius_km: Optional[float] = Query(default=None, gt=0, le=500, description="Radius for near, default 10"),
+    fields: Optional[str] = Query(default=None, description="Projection, e.g. name,lat,lng,category"),
+    limit: Optional[int] = Query(default=None, ge=1, le=5000, description="Page size"),
+    cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page"),
+    format: Literal["json", "ndjson"] = Query(default="json", description="ndjson streams one record per line"),
+) -> Response:
     """
     Unified endpoint for the frontend.
     Returns items with added fields: city, category.
+    With near= results are sorted by distance and carry distance_km.
+
+    With limit/cursor the JSON body is {"items": [...], "next_cursor": ...}.
+    format=ndjson (or Accept: application/x-ndjson) streams records as they
+    are serialized; the next cursor is then sent as X-Next-Cursor header.
     """
-    items = load_all(city=city, category=category)
+    bbox_v = _parse_bbox(bbox)
+    near_v = _parse_near(near)
+    fields_v = _parse_fields(fields)
+    paged = limit is not None or cursor is not None
 
-    if status:
-        s = status.strip().upper()
-        items = [x for x in items if str(x.get("status", "")).upper() == s]
+    def page() -> Tuple[List[Any], Optional[List[float]], Optional[str]]:
+        version = get_index().version
+        records, distances = query_records(city, category, status, bbox_v, near_v, radius_km)
+        if not paged:
+            return records, distances, None
+        start = _decode_cursor(cursor, version)
+        end = len(records) if limit is None else start + limit
+        next_cursor = _encode_cursor(version, end) if end < len(records) else None
+        return records[start:end], distances[start:end] if distances is not None else None, next_cursor
 
-    return items
+    if format == "ndjson" or "application/x-ndjson" in request.headers.get("accept", ""):
+        get_index().poll()
+        records, distances, next_cursor = page()
+        lines = (
+            json.dumps(item, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for item in iter_dicts(records, distances, fields_v)
+        )
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        return StreamingResponse(lines, media_type="application/x-ndjson", headers=headers)
 
+    def build() -> Any:
+        records, distances, next_cursor = page()
+        items = to_dicts(records, distances, fields_v)
+        return {"items": items, "next_cursor": next_cursor} if paged else items
 
-@app.get("/api/providers/{city}/{category}")
-def providers_by_path(city: str, category: Literal["blood", "dexa"]) -> List[Dict[str, Any]]:
+    return _cached_json(request, build)
+
+
+@app.get("/api/clusters", response_model=Dict[str, Any])
+def clusters(
+    request: Request,
+    zoom: int = Query(ge=0, le=22, description="Map zoom level"),
+    bbox: Optional[str] = Query(default=None, description="west,south,east,north of the viewport"),
+    category: Optional[Literal["blood", "dexa"]] = Query(default=None),
+    status: Optional[str] = Query(default=None, description="Optional: YES/NO/QUESTIONABLE"),
+    fields: Optional[str] = Query(default=None, description="Fields of single providers, default name,lat,lng,city,category,status"),
+) -> Response:
+    """
+    Server-side marker clustering for the map.
+    Returns {"zoom", "clusters": [{lat, lng, count, categories, statuses}], "points": [...]}.
+    Above the deepest cluster level (14) every provider in the box is a point.
+    """
+    bbox_v = _parse_bbox(bbox)
+    fields_v = _parse_fields(fields)
+    return _cached_json(request, lambda: query_clusters(zoom, bbox_v, category=category, status=status, fields=fields_v))
+
+
+@app.get("/api/search", response_model=List[Dict[str, Any]])
+def search(
+    request: Request,
+    q: str = Query(min_length=1, max_length=200, description="e.g. Direktlabor Alexanderplatz, Viszeralfett"),
+    city: Optional[str] = Query(default=None),
+    category: Optional[Literal["blood", "dexa"]] = Query(default=None),
+    limit: int = Query(default=20, ge=1, le=200),
+) -> Response:
+    """
+    Full-text search over name, address, google_category, domain, city and
+    evidence_quote. Umlauts/ß are folded, terms match as prefixes, results are
+    BM25-ranked and carry a score field.
+    """
+    return _cached_json(request, lambda: search_providers(q, city=city, category=category, limit=limit))
+
+
+@app.get("/api/providers/{city}/{category}", response_model=List[Dict[str, Any]])
+def providers_by_path(request: Request, city: str, category: Literal["blood", "dexa"]) -> Response:
     """
     Direct access if you want it (handy for debugging).
     """
-    items = load_dataset(city, category)
-    out: List[Dict[str, Any]] = []
-    for x in items:
-        if isinstance(x, dict):
-            y = dict(x)
-            y["city"] = city
-            y["category"] = category
-            out.append(y)
-    return out
+    return _cached_json(request, lambda: load_dataset(city, category))
 
 
-@app.get("/api/stats")
-def stats() -> Dict[str, Any]:
+@app.get("/api/stats", response_model=Dict[str, Any])
+def stats(request: Request) -> Response:
     """
     Quick KPI endpoint for reviewers: counts per city/category.
     """
-    keys = discover_datasets()
-    result: Dict[str, Dict[str, int]] = {}
-    for k in keys:
-        city = k.city
-        result.setdefault(city, {})
-        result[city][k.category] = len(load_dataset(k.city, k.category))
-    return result
+    return _cached_json(request, lambda: get_index().stats())
+
+
+@app.get("/api/analytics", response_model=Dict[str, Any])
+def analytics(request: Request) -> Response:
+    """
+    Precomputed analytics over VALID and REJECTED outputs: totals, per category,
+    per city (and city x category), per google_category. Each group carries
+    status and reason-class counts, yes rate, scrape coverage, share decided
+    locally and LLM error rate.
+    """
+    return _cached_json(request, lambda: get_index().analytics())
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional
+
+from fastapi import Request, Response
+
+
+# Bodies smaller than this are not worth compressing.
+GZIP_MIN_BYTES = 1024
+DEFAULT_MAX_ENTRIES = 512
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    etag: str
+    body: bytes
+    gzip_body: Optional[bytes]
+
+
+def _serialize(data: Any) -> bytes:
+    # Same output as FastAPI's JSONResponse.
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def _build_entry(data: Any) -> CachedBody:
+    body = _serialize(data)
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    gzip_body = gzip.compress(body, compresslevel=6, mtime=0) if len(body) >= GZIP_MIN_BYTES else None
+    return CachedBody(etag=etag, body=body, gzip_body=gzip_body)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag.strip('"')
+    for candidate in if_none_match.split(","):
+        c = candidate.strip()
+        if c.startswith("W/"):
+            c = c[2:]
+        c = c.strip('"')
+        # The gzip representation carries a -gz suffix; both mean the same data.
+        if c == bare or c == bare + "-gz":
+            return True
+    return False
+
+
+class ResponseCache:
+    """
+    Serialized (and pre-compressed) JSON bodies per query key.
+
+    Every entry belongs to one data version; when the provider index publishes
+    a new snapshot the whole cache is dropped. Bounded LRU because bbox/near
+    queries produce an open-ended set of keys.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._entries: "OrderedDict[Hashable, CachedBody]" = OrderedDict()
+
+    def get_or_build(self, key: Hashable, version: int, build: Callable[[], Any]) -> CachedBody:
+        with self._lock:
+            if self._version != version:
+                self._entries.clear()
+                self._version = version
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        # Build outside the lock; two concurrent misses just do the work twice.
+        entry = _build_entry(build())
+
+        with self._lock:
+            if self._version == version:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self._max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+
+def request_key(request: Request) -> Hashable:
+    return (request.url.path, tuple(sorted(request.query_params.multi_items())))
+
+
+def respond(request: Request, entry: CachedBody) -> Response:
+    """
+    304 if the client already has this body, else the (gzip) bytes with a strong ETag.
+    """
+    use_gzip = entry.gzip_body is not None and "gzip" in request.headers.get("accept-encoding", "").lower()
+    etag = entry.etag[:-1] + '-gz"' if use_gzip else entry.etag
+    headers = {
+        "ETag": etag,
+        # Clients and CDNs may store the body but must revalidate before reuse.
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers=headers)
+
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=entry.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
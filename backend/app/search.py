@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import bisect
+import math
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .storage import Provider
+
+
+# Field weights (BM25F-style): a hit in the name counts more than one in a long quote.
+FIELD_WEIGHTS: Dict[str, float] = {
+    "name": 3.0,
+    "google_category": 2.0,
+    "city": 1.5,
+    "address": 1.0,
+    "domain": 1.0,
+    "evidence_quote": 1.0,
+}
+
+K1 = 1.2
+B = 0.75
+
+# Query terms shorter than this only match exactly, longer ones also as prefix.
+MIN_PREFIX_LEN = 3
+# Prefix hits score a bit lower than exact hits.
+PREFIX_PENALTY = 0.7
+
+STOPWORDS = frozenset(
+    """
+    der die das den dem des ein eine einer eines und oder in im am an auf bei mit
+    von vom zu zum zur für fuer ohne near the and of for in at
+    """.split()
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+_UMLAUT_EXPANSIONS = {"ä": "ae", "ö": "oe", "ü": "ue"}
+
+
+def _strip_accents(text: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def normalize(text: str) -> List[str]:
+    """
+    German-aware folding: lowercase, ß -> ss, umlauts and accents stripped
+    (Zürich -> zurich, Körperfett -> korperfett).
+    """
+    text = (text or "").lower().replace("ß", "ss")
+    return _TOKEN_RE.findall(_strip_accents(text))
+
+
+def index_terms(text: str) -> List[str]:
+    """
+    Tokens for indexing. Words with umlauts are indexed twice so that both
+    "zurich" and "zuerich" find "Zürich".
+    """
+    terms = normalize(text)
+    lowered = (text or "").lower().replace("ß", "ss")
+    if any(u in lowered for u in _UMLAUT_EXPANSIONS):
+        for u, repl in _UMLAUT_EXPANSIONS.items():
+            lowered = lowered.replace(u, repl)
+        expanded = set(_TOKEN_RE.findall(_strip_accents(lowered))) - set(terms)
+        terms.extend(expanded)
+    return terms
+
+
+def query_terms(q: str) -> List[str]:
+    seen: List[str] = []
+    for t in normalize(q):
+        if t not in STOPWORDS and t not in seen:
+            seen.append(t)
+    return seen
+
+
+class SearchIndex:
+    """
+    Inverted index over name, address, category, domain, city and evidence
+    quote with BM25F-style ranking and prefix matching on a sorted term list.
+    """
+
+    def __init__(self, records: Sequence[Provider], evidence: Sequence[Optional[str]]) -> None:
+        self.records = list(records)
+        postings: Dict[str, Dict[int, float]] = defaultdict(dict)
+        self.doc_len: List[float] = []
+
+        for doc_id, (rec, quote) in enumerate(zip(self.records, evidence)):
+            length = 0.0
+            for f, weight in FIELD_WEIGHTS.items():
+                value = quote if f == "evidence_quote" else rec.get(f)
+                if not value:
+                    continue
+                terms = index_terms(str(value))
+                length += weight * len(terms)
+                for t in terms:
+                    postings[t][doc_id] = postings[t].get(doc_id, 0.0) + weight
+            self.doc_len.append(length)
+
+        self.postings: Dict[str, List[Tuple[int, float]]] = {t: list(d.items()) for t, d in postings.items()}
+        self.terms: List[str] = sorted(self.postings)
+        n = len(self.records)
+        self.avg_len = (sum(self.doc_len) / n) if n else 0.0
+        self.idf: Dict[str, float] = {
+            t: math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for t, p in self.postings.items()
+        }
+
+    def _expand(self, term: str) -> Iterable[Tuple[str, float]]:
+        if term in self.postings:
+            yield term, 1.0
+        if len(term) < MIN_PREFIX_LEN:
+            return
+        i = bisect.bisect_left(self.terms, term)
+        while i < len(self.terms) and self.terms[i].startswith(term):
+            if self.terms[i] != term:
+                yield self.terms[i], PREFIX_PENALTY
+            i += 1
+
+    def search(self, q: str) -> List[Tuple[float, Provider]]:
+        """
+        (score, record) pairs, best first. Documents matching any term are
+        returned; more matched terms and rarer terms rank higher.
+        """
+        scores: Dict[int, float] = defaultdict(float)
+        for term in query_terms(q):
+            # A document gets the best of its exact/prefix expansions per query term.
+            best: Dict[int, float] = {}
+            for t, factor in self._expand(term):
+                idf = self.idf[t]
+                for doc_id, tf in self.postings[t]:
+                    norm = K1 * (1 - B + B * self.doc_len[doc_id] / (self.avg_len or 1.0))
+                    s = factor * idf * tf * (K1 + 1) / (tf + norm)
+                    if s > best.get(doc_id, 0.0):
+                        best[doc_id] = s
+            for doc_id, s in best.items():
+                scores[doc_id] += s
+
+        ranked = sorted(scores.items(), key=lambda x: (-x[1], x[0]))
+        return [(score, self.records[doc_id]) for doc_id, score in ranked]
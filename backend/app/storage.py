@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+
+# Consolidated, indexed provider store written by the scraper next to the JSON files.
+SQLITE_FILENAME = "providers.sqlite"
+SQLITE_SCHEMA_VERSION = 1
+
+# Fields kept in slots on every record. Everything else the scraper writes
+# (content_hash, validated_at, ...) lives in a small per-record dict.
+HOT_FIELDS = (
+    "name",
+    "website",
+    "google_category",
+    "domain",
+    "address",
+    "phone",
+    "lat",
+    "lng",
+    "status",
+)
+
+# Low-cardinality strings shared by many records.
+_INTERNED = ("google_category", "status")
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Provider:
+    """
+    Compact provider record.
+
+    Hot fields live in slots; evidence_quote is either kept inline (JSON source)
+    or fetched from the SQLite store only when a response actually needs it.
+    Supports the read-only parts of the dict API (get, [], in) used by the index.
+    """
+
+    __slots__ = HOT_FIELDS + ("city", "category", "extra", "_evidence", "_source", "_row_id")
+
+    def __init__(
+        self,
+        data: Dict[str, Any],
+        city: str,
+        category: str,
+        evidence: Optional[str] = None,
+        source: Optional["SqliteSource"] = None,
+        row_id: Optional[int] = None,
+    ) -> None:
+        for f in HOT_FIELDS:
+            value = data.get(f)
+            setattr(self, f, _intern(value) if f in _INTERNED else value)
+        self.city = sys.intern(city)
+        self.category = sys.intern(category)
+        extra = {
+            k: v for k, v in data.items()
+            if k not in HOT_FIELDS and k not in ("evidence_quote", "city", "category")
+        }
+        self.extra = extra or None
+        self._evidence = evidence
+        self._source = source
+        self._row_id = row_id
+
+    @property
+    def evidence_is_lazy(self) -> bool:
+        return self._source is not None and self._evidence is None
+
+    @property
+    def evidence_quote(self) -> Optional[str]:
+        if self.evidence_is_lazy:
+            assert self._source is not None and self._row_id is not None
+            return self._source.evidence([self._row_id]).get(self._row_id)
+        return self._evidence
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in HOT_FIELDS or key in ("city", "category"):
+            value = getattr(self, key)
+            return default if value is None else value
+        if key == "evidence_quote":
+            value = self.evidence_quote
+            return default if value is None else value
+        return (self.extra or {}).get(key, default)
+
+    def __getitem__(self, key: str) -> Any:
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self.get(key) is not None
+
+    def to_dict(self, evidence: Any = ..., fields: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """
+        Same shape as the original JSON record plus city + category.
+        Pass evidence to skip the lazy lookup (e.g. after a batch fetch).
+        With fields only those keys are returned (unknown ones are skipped).
+        """
+        if fields is not None and evidence is ... and "evidence_quote" not in fields:
+            evidence = None
+        out: Dict[str, Any] = {f: getattr(self, f) for f in HOT_FIELDS}
+        out["evidence_quote"] = self.evidence_quote if evidence is ... else evidence
+        if self.extra:
+            out.update(self.extra)
+        out["city"] = self.city
+        out["category"] = self.category
+        if fields is not None:
+            return {f: out[f] for f in fields if f in out}
+        return out
+
+
+class SqliteSource:
+    """
+    Read-only access to providers.sqlite. Connections are opened per call so the
+    object can be shared across the request threadpool.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+
+    def read(self) -> Dict[Tuple[str, str], List[Provider]]:
+        """
+        Loads all hot fields (not the evidence quotes), grouped by (city, category).
+        """
+        out: Dict[Tuple[str, str], List[Provider]] = {}
+        con = self._connect()
+        try:
+            version = con.execute("PRAGMA user_version").fetchone()[0]
+            if version != SQLITE_SCHEMA_VERSION:
+                return {}
+            cols = ", ".join(HOT_FIELDS)
+            rows = con.execute(
+                f"SELECT id, city, category, {cols}, extra FROM providers ORDER BY city, category, position"
+            )
+            for row in rows:
+                row_id, city, category = row[0], row[1], row[2]
+                data = dict(zip(HOT_FIELDS, row[3:-1]))
+                if row[-1]:
+                    data.update(json.loads(row[-1]))
+                out.setdefault((city, category), []).append(
+                    Provider(data, city, category, source=self, row_id=row_id)
+                )
+        finally:
+            con.close()
+        return out
+
+    def evidence(self, row_ids: List[int]) -> Dict[int, Optional[str]]:
+        out: Dict[int, Optional[str]] = {}
+        if not row_ids:
+            return out
+        con = self._connect()
+        try:
+            # Stay well below SQLITE_MAX_VARIABLE_NUMBER.
+            for i in range(0, len(row_ids), 500):
+                chunk = row_ids[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                for row_id, quote in con.execute(
+                    f"SELECT id, evidence_quote FROM providers WHERE id IN ({marks})", chunk
+                ):
+                    out[row_id] = quote
+        except sqlite3.Error:
+            pass
+        finally:
+            con.close()
+        return out
+
+
+def read_json(path: Path, city: str, category: str) -> List[Provider]:
+    """
+    Parses one *_VALID.json file. Broken or non-list files yield an empty
+    dataset to avoid frontend breakage.
+    """
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return []
+
+    if not isinstance(data, list):
+        return []
+
+    return [
+        Provider(item, city, category, evidence=item.get("evidence_quote"))
+        for item in data
+        if isinstance(item, dict)
+    ]
+
+
+def read_sqlite(path: Path) -> Dict[Tuple[str, str], List[Provider]]:
+    try:
+        return SqliteSource(path).read()
+    except sqlite3.Error:
+        return {}
+
+
+def evidence_for(providers: List[Provider]) -> List[Optional[str]]:
+    """
+    Evidence quotes for many records. Lazy quotes are fetched with one query
+    per source instead of one per record.
+    """
+    quotes: Dict[Tuple[int, int], Optional[str]] = {}
+    by_source: Dict[int, Tuple[SqliteSource, List[int]]] = {}
+    for p in providers:
+        if p.evidence_is_lazy:
+            assert p._source is not None and p._row_id is not None
+            by_source.setdefault(id(p._source), (p._source, []))[1].append(p._row_id)
+    for source_id, (source, ids) in by_source.items():
+        for row_id, quote in source.evidence(ids).items():
+            quotes[(source_id, row_id)] = quote
+
+    return [
+        quotes.get((id(p._source), p._row_id)) if p.evidence_is_lazy else p._evidence  # type: ignore[arg-type]
+        for p in providers
+    ]
+
+
+def materialize(providers: List[Provider], fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Turns records into response dicts, optionally projected to fields.
+    Evidence quotes are only looked up if the projection asks for them.
+    """
+    if fields is not None and "evidence_quote" not in fields:
+        return [p.to_dict(evidence=None, fields=fields) for p in providers]
+    return [p.to_dict(evidence=q, fields=fields) for p, q in zip(providers, evidence_for(providers))]
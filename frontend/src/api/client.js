@@ -1,19 +1,52 @@
 const API_BASE = import.meta.env.VITE_API_BASE ?? 'http://localhost:8000';
 
+// Revalidate with If-None-Match instead of re-downloading: the API answers 304
+// as long as the data has not changed.
+const FETCH_OPTS = { cache: 'no-cache' };
+
 export async function fetchDatasets() {
-  const res = await fetch(`${API_BASE}/api/datasets`);
+  const res = await fetch(`${API_BASE}/api/datasets`, FETCH_OPTS);
   if (!res.ok) throw new Error('Failed to load datasets');
   return res.json();
 }
 
-export async function fetchProviders({ city, category, status } = {}) {
+export async function fetchProviders({
+  city,
+  category,
+  status,
+  bbox,
+  near,
+  radiusKm,
+  fields,
+} = {}) {
   const url = new URL(`${API_BASE}/api/providers`);
   if (city) url.searchParams.set('city', city);
   if (category && category !== 'all')
     url.searchParams.set('category', category);
   if (status) url.searchParams.set('status', status);
+  // bbox: Leaflet bounds.toBBoxString() -> "west,south,east,north"
+  if (bbox) url.searchParams.set('bbox', bbox);
+  if (near) url.searchParams.set('near', `${near.lat},${near.lng}`);
+  if (near && radiusKm) url.searchParams.set('radius_km', String(radiusKm));
+  // fields: e.g. ['name', 'lat', 'lng', 'category'] for map markers only
+  if (fields?.length) url.searchParams.set('fields', fields.join(','));
 
-  const res = await fetch(url.toString());
+  const res = await fetch(url.toString(), FETCH_OPTS);
   if (!res.ok) throw new Error('Failed to load providers');
   return res.json();
 }
+
+export async function fetchClusters({ zoom, bbox, category, status, fields } = {}) {
+  const url = new URL(`${API_BASE}/api/clusters`);
+  url.searchParams.set('zoom', String(Math.round(zoom)));
+  if (bbox) url.searchParams.set('bbox', bbox);
+  if (category && category !== 'all')
+    url.searchParams.set('category', category);
+  if (status) url.searchParams.set('status', status);
+  if (fields?.length) url.searchParams.set('fields', fields.join(','));
+
+  // -> { zoom, clusters: [{ lat, lng, count, categories, statuses }], points: [...] }
+  const res = await fetch(url.toString(), FETCH_OPTS);
+  if (!res.ok) throw new Error('Failed to load clusters');
+  return res.json();
+}
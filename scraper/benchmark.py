@@ -0,0 +1,177 @@
+"""
+Offline-Benchmark der kompletten Pipeline mit synthetischen Daten (siehe replay.py).
+
+    python -m scraper.benchmark                       # 100, 1000, 10000 Kandidaten
+    python -m scraper.benchmark --scales 100 500 --llm-latency-ms 200 --json bench.json
+
+Misst pro Stage (discovery, sniper, validate, pipeline): Laufzeit, Durchsatz (Kandidaten/s)
+und Spitzen-Speicher (tracemalloc, relativ zum Stand vor der Stage).
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+from contextlib import redirect_stdout
+from . import main, metrics, replay, clusters, scraper as scraping
+
+STAGES = ("discovery", "sniper", "validate")
+
+class _PeakTracker:
+    """
+    tracemalloc kennt nur einen globalen Peak. Stages setzen ihn zurück, deshalb merken wir uns
+    den bisherigen Höchststand, damit die umschließende Pipeline ihren echten Peak behält.
+    """
+
+    def __init__(self):
+        self.high = 0
+
+    def reset(self):
+        self.high = max(self.high, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        return tracemalloc.get_traced_memory()[0]
+
+    def peak(self):
+        self.high = max(self.high, tracemalloc.get_traced_memory()[1])
+        return tracemalloc.get_traced_memory()[1]
+
+def _measured(name, fn, results, peaks):
+    def wrapper(*args, **kwargs):
+        base = peaks.reset()
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            results[name] = {"wall_s": time.perf_counter() - t0, "peak_mb": (peaks.peak() - base) / 1e6}
+    return wrapper
+
+def run_scale(n, actor_latency_s=0.0, llm_latency_s=0.0, page_chars=8000):
+    """
+    Ein Pipeline-Durchlauf mit n synthetischen Kandidaten. Gibt Stage-Ergebnisse zurück.
+    """
+    replay.install(
+        "synthetic",
+        source=replay.SyntheticSource(n, page_chars=page_chars),
+        actor_latency_s=actor_latency_s,
+        llm_latency_s=llm_latency_s,
+    )
+    metrics.reset()
+    clusters.reset()
+
+    results = {}
+    peaks = _PeakTracker()
+    originals = {
+        "find_places_discovery": main.find_places_discovery,
+        "sniper_search_and_scrape": main.sniper_search_and_scrape,
+        "validate_batch": main.validate_batch,
+    }
+    main.find_places_discovery = _measured("discovery", originals["find_places_discovery"], results, peaks)
+    main.sniper_search_and_scrape = _measured("sniper", originals["sniper_search_and_scrape"], results, peaks)
+    main.validate_batch = _measured("validate", originals["validate_batch"], results, peaks)
+
+    tracemalloc.start()
+    try:
+        spec = main.PIPELINES["DEXA"]
+        base = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+            valid, rejected = main.run_pipeline(
+                "Berlin", "de", "DEXA",
+                queries=[q.format(city="Berlin") for q in spec["queries"]],
+                keywords=spec["keywords"],
+                validator=spec["validator"],
+            )
+        peaks.peak()
+        results["pipeline"] = {"wall_s": time.perf_counter() - t0, "peak_mb": (peaks.high - base) / 1e6}
+    finally:
+        tracemalloc.stop()
+        for name, fn in originals.items():
+            setattr(main, name, fn)
+
+    for r in results.values():
+        r["per_s"] = n / r["wall_s"] if r["wall_s"] else None
+    return {"candidates": n, "valid": len(valid), "rejected": len(rejected), "stages": results}
+
+def check_shared_domains(n=20, shared_every=2):
+    """
+    Mehrere Anbieter auf einer Domain (Ärztehaus): jeder Kandidat muss Text bekommen, Unterseiten
+    unter dem Website-Pfad eines Kandidaten nur dieser, und pro Domain geht genau eine site:-Query raus.
+    Gibt die Liste der Fehler zurück (leer = ok).
+    """
+    source = replay.SyntheticSource(n, shared_every=shared_every)
+    replay.install("synthetic", source=source)
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        candidates = scraping.find_places_discovery("Berlin", ["Synth"])
+        content_map = scraping.sniper_search_and_scrape(candidates, ["DEXA"], "de")
+
+    errors = []
+    if len(candidates) != n:
+        errors.append(f"{len(candidates)} von {n} Kandidaten nach Discovery")
+    domains = {c["domain"] for c in candidates}
+    if sorted(source.site_queries) != sorted(domains):
+        errors.append(f"{len(source.site_queries)} site:-Queries für {len(domains)} Domains")
+    for i, cand in enumerate(candidates):
+        text = content_map.get(cand["website"])
+        if not text:
+            errors.append(f"{cand['name']}: kein Text")
+            continue
+        for j in range(n):
+            if j != i and source.is_shared(j) and f"/praxis-{j}/" in text:
+                errors.append(f"{cand['name']}: enthält Unterseiten von Synth Praxis {j}")
+                break
+    return errors
+
+def print_table(runs):
+    print(f"{'N':>7} | {'STAGE':<10} | {'WALL_S':>8} | {'KAND/S':>10} | {'PEAK_MB':>8}")
+    print("-" * 56)
+    for run in runs:
+        for stage in STAGES + ("pipeline",):
+            r = run["stages"].get(stage)
+            if not r:
+                continue
+            per_s = f"{r['per_s']:.0f}" if r["per_s"] else "-"
+            print(f"{run['candidates']:>7} | {stage:<10} | {r['wall_s']:>8.3f} | {per_s:>10} | {r['peak_mb']:>8.1f}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline-Benchmark der Scraper-Pipeline")
+    parser.add_argument("--scales", nargs="+", type=int, default=[100, 1000, 10000],
+                        help="Anzahl synthetischer Kandidaten pro Durchlauf")
+    parser.add_argument("--actor-latency-ms", type=float, default=0.0,
+                        help="Künstliche Latenz pro Apify Actor-Run")
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0,
+                        help="Künstliche Latenz pro LLM-Call")
+    parser.add_argument("--page-chars", type=int, default=8000,
+                        help="Textlänge pro gescrapter Seite")
+    parser.add_argument("--json", metavar="DATEI", help="Ergebnisse zusätzlich als JSON schreiben")
+    parser.add_argument("--check", action="store_true",
+                        help="Nur prüfen, ob Anbieter mit gemeinsamer Domain alle ihren Text bekommen")
+    return parser.parse_args(argv)
+
+def bench(argv=None):
+    args = parse_args(argv)
+    if args.check:
+        errors = check_shared_domains()
+        for error in errors:
+            print(f"❌ {error}", file=sys.stderr)
+        if errors:
+            sys.exit(1)
+        print("✅ Gemeinsame Domains: alle Kandidaten haben Text")
+        return []
+    runs = []
+    for n in args.scales:
+        print(f"⏱️  {n} Kandidaten ...", file=sys.stderr)
+        runs.append(run_scale(
+            n,
+            actor_latency_s=args.actor_latency_ms / 1000,
+            llm_latency_s=args.llm_latency_ms / 1000,
+            page_chars=args.page_chars,
+        ))
+    print_table(runs)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(runs, f, indent=2)
+    return runs
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,109 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from .utils import normalize_text
+from .config import (
+    VALIDATION_CACHE_ENABLED, VALIDATION_CACHE_PATH,
+    VALIDATION_CACHE_TTL_DAYS, VALIDATION_CACHE_MAX_ENTRIES,
+)
+
+def cache_key(model, kind, name, text):
+    h = hashlib.sha256()
+    for part in (model, kind, (name or "").strip(), normalize_text(text)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+class ValidationCache:
+    """
+    Persistenter Cache für LLM-Verdicts (SQLite).
+    - TTL: Einträge älter als ttl_days zählen als Miss und werden beim Aufräumen gelöscht
+    - Größe: über max_entries fliegen die am längsten nicht genutzten Einträge raus
+    Fehlerhafte Verdicts ("AI Error") werden nie gecacht.
+    """
+
+    # Nach so vielen Schreibvorgängen wird aufgeräumt (nicht bei jedem put)
+    EVICT_EVERY = 200
+
+    def __init__(self, path, ttl_days=VALIDATION_CACHE_TTL_DAYS, max_entries=VALIDATION_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts ("
+            " key TEXT PRIMARY KEY, verdict TEXT NOT NULL,"
+            " created REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_verdicts_last_used ON verdicts(last_used)")
+        self._db.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT verdict, created FROM verdicts WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE verdicts SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, verdict):
+        if str(verdict.get("reason") or "").startswith("AI Error"):
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO verdicts (key, verdict, created, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(verdict, ensure_ascii=False), now, now),
+            )
+            self._puts += 1
+            if self._puts % self.EVICT_EVERY == 0:
+                self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now):
+        self._db.execute("DELETE FROM verdicts WHERE created < ?", (now - self.ttl,))
+        self._db.execute(
+            "DELETE FROM verdicts WHERE key IN ("
+            " SELECT key FROM verdicts ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def close(self):
+        with self._lock:
+            self._evict(time.time())
+            self._db.commit()
+            self._db.close()
+
+    def stats_line(self):
+        total = self.hits + self.misses
+        rate = (100.0 * self.hits / total) if total else 0.0
+        return f"💾 Validierungs-Cache: {self.hits} Hits, {self.misses} Misses ({rate:.0f}% Trefferquote)"
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """
+    Prozessweiter Cache (None wenn per VALIDATION_CACHE=0 deaktiviert).
+    """
+    global _cache
+    if not VALIDATION_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ValidationCache(VALIDATION_CACHE_PATH)
+        return _cache
@@ -0,0 +1,217 @@
+"""
+Ketten und Filialen erkennen, damit Suche, Scrape und Validierung pro Cluster nur einmal laufen.
+
+Kandidaten landen im selben Cluster bei
+- gleichem Host UND gleichem Namen ("Evidia Radiologie" auf evidia.de); der Host allein reicht nie,
+  Plattform-/Verzeichnis-Hosts (facebook.com, jameda.de, business.site, ...) zählen gar nicht
+- gleicher normalisierter Telefonnummer
+- ähnlichem Namen in wenigen Metern Abstand (gleiche Praxis mit zwei Websites)
+
+REGISTRY teilt die Cluster zwischen den Pipelines eines Batch-Laufs (gleiche Kategorie,
+andere Stadt): wer einen Cluster zuerst beansprucht, macht die Arbeit, alle anderen
+übernehmen das Verdict für ihre Filialen.
+"""
+import re
+import math
+import threading
+from .domains import registrable_domain
+from .utils import get_domain
+from .incremental import VERDICT_FIELDS
+
+COUNTRY_PREFIXES = {"de": "49", "at": "43", "ch": "41"}
+
+# Gleicher Standort: max. Abstand + Mindest-Ähnlichkeit der Namen
+SAME_PLACE_METERS = 75
+MIN_NAME_SIMILARITY = 0.6
+_CELL_DEG = 0.001  # ~110 m, Nachbarzellen werden mitgeprüft
+
+# Generische Namensbestandteile zählen nicht für die Ähnlichkeit
+_NAME_STOPWORDS = {
+    "praxis", "dr", "med", "mvz", "gmbh", "ag", "kg", "co", "und", "fuer", "für", "die", "der",
+    "labor", "radiologie", "zentrum", "institut", "gemeinschaftspraxis", "facharzt",
+}
+_TOKEN_RE = re.compile(r"\w+")
+
+# Hosts, unter denen viele fremde Anbieter liegen (Social Media, Baukästen, Verzeichnisse).
+# Geprüft wird die registrierbare Domain, also auch Subdomains ("praxis.jimdofree.com").
+SHARED_HOSTS = {
+    "facebook.com", "fb.com", "instagram.com", "linkedin.com", "xing.com", "linktr.ee",
+    "google.com", "google.de", "google.at", "google.ch", "g.page", "goo.gl",
+    "business.site", "wixsite.com", "jimdo.com", "jimdofree.com", "jimdosite.com", "webnode.page",
+    "webnode.com", "site123.me", "wordpress.com", "blogspot.com", "one.com",
+    "doctolib.de", "doctolib.at", "doctolib.ch", "jameda.de", "sanego.de", "docfinder.at",
+    "onedoc.ch", "arzt-auskunft.de", "gelbeseiten.de", "dasoertliche.de", "11880.com",
+    "herold.at", "local.ch", "search.ch", "yelp.de", "yelp.com", "yelp.at", "yelp.ch",
+}
+
+def normalize_phone(phone, country_code=None):
+    """
+    "+49 (0)30 123 45-6" / "030 123456" -> "4930123456". Zu kurz/leer -> "".
+    """
+    raw = str(phone or "").replace("(0)", "")
+    digits = "".join(c for c in raw if c.isdigit())
+    if not raw.strip().startswith("+"):
+        if digits.startswith("00"):
+            digits = digits[2:]
+        elif digits.startswith("0") and country_code in COUNTRY_PREFIXES:
+            digits = COUNTRY_PREFIXES[country_code] + digits[1:]
+    return digits if len(digits) >= 8 else ""
+
+def _name_tokens(name):
+    return {t for t in _TOKEN_RE.findall((name or "").lower()) if t not in _NAME_STOPWORDS and len(t) > 1}
+
+def _similar(a, b):
+    if not a or not b:
+        return False
+    return len(a & b) / len(a | b) >= MIN_NAME_SIMILARITY
+
+def _meters(lat1, lng1, lat2, lng2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * 6371000 * math.asin(math.sqrt(min(1.0, a)))
+
+def site_host(domain):
+    """
+    Voller Host als Cluster-Merkmal, "" für Plattform-/Verzeichnis-Hosts.
+    """
+    host = get_domain(domain)
+    if not host or registrable_domain(host) in SHARED_HOSTS:
+        return ""
+    return host
+
+def keys(cand, country_code=None):
+    """
+    Cluster-Schlüssel eines Kandidaten (gleicher Schlüssel -> gleicher Cluster).
+    Die Website zählt nur zusammen mit dem Namen: zwei Anbieter mit anderem Namen auf
+    demselben Host bleiben getrennt.
+    """
+    out = []
+    host = site_host(cand.get("domain") or "")
+    name = " ".join(sorted(_name_tokens(cand.get("name"))))
+    if host and name:
+        out.append(("domain", host, name))
+    phone = normalize_phone(cand.get("phone"), country_code)
+    if phone:
+        out.append(("phone", phone))
+    return out
+
+def group(candidates, country_code=None):
+    """
+    -> Liste von Clustern (Listen von Kandidaten), jeweils in Discovery-Reihenfolge.
+    Der erste Kandidat eines Clusters ist sein Repräsentant.
+    """
+    parent = list(range(len(candidates)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j):
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+
+    first_by_key = {}
+    cells = {}
+    for i, cand in enumerate(candidates):
+        for key in keys(cand, country_code):
+            if key in first_by_key:
+                union(i, first_by_key[key])
+            else:
+                first_by_key[key] = i
+
+        lat, lng = cand.get("lat"), cand.get("lng")
+        if lat is None or lng is None:
+            continue
+        tokens = _name_tokens(cand.get("name"))
+        cy, cx = int(lat // _CELL_DEG), int(lng // _CELL_DEG)
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                for j, olat, olng, otokens in cells.get((cy + dy, cx + dx), ()):
+                    if _meters(lat, lng, olat, olng) <= SAME_PLACE_METERS and _similar(tokens, otokens):
+                        union(i, j)
+        cells.setdefault((cy, cx), []).append((i, lat, lng, tokens))
+
+    clusters = {}
+    for i, cand in enumerate(candidates):
+        clusters.setdefault(find(i), []).append(cand)
+    return list(clusters.values())
+
+def label(cluster, country_code=None):
+    """
+    Lesbare Cluster-ID: Host des Repräsentanten, sonst Telefonnummer.
+    """
+    found = keys(cluster[0], country_code)
+    return found[0][1] if found else (cluster[0].get("domain") or cluster[0].get("name"))
+
+def fan_out(rep, cluster, country_code=None):
+    """
+    Überträgt das Verdict des Repräsentanten auf alle Filialen des Clusters.
+    -> Kandidaten, die ein übernommenes Verdict bekommen haben.
+    """
+    name = label(cluster, country_code)
+    out = []
+    for cand in cluster:
+        cand["cluster"] = name
+        if cand is rep:
+            continue
+        for field in VERDICT_FIELDS + ("content_checked_at",):
+            if field in rep:
+                cand[field] = rep[field]
+        out.append(cand)
+    return out
+
+class _Entry:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None  # Repräsentant mit Verdict, None wenn dessen Pipeline fehlgeschlagen ist
+
+    def publish(self, rep):
+        self.result = rep
+        self.done.set()
+
+    def abandon(self):
+        self.done.set()
+
+class ClusterRegistry:
+    """
+    Prozessweit geteilte Cluster pro Kategorie (Verdicts sind kategorie-spezifisch).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # (category, key) -> _Entry
+
+    def claim(self, category, clusters, country_code=None):
+        """
+        -> (own, shared): Listen von (entry, cluster).
+        own: dieser Aufrufer macht die Arbeit und muss publish()/abandon() aufrufen.
+        shared: eine andere Pipeline macht sie bereits, Ergebnis per wait().
+        """
+        own, shared = [], []
+        with self._lock:
+            for cluster in clusters:
+                cluster_keys = [(category, k) for c in cluster for k in keys(c, country_code)]
+                entry = next((self._entries[k] for k in cluster_keys if k in self._entries), None)
+                if entry is None or (entry.done.is_set() and entry.result is None):
+                    entry = _Entry()
+                    own.append((entry, cluster))
+                else:
+                    shared.append((entry, cluster))
+                for k in cluster_keys:
+                    self._entries[k] = entry
+        return own, shared
+
+    def wait(self, entry):
+        entry.done.wait()
+        return entry.result
+
+REGISTRY = ClusterRegistry()
+
+def reset():
+    global REGISTRY
+    REGISTRY = ClusterRegistry()
+    return REGISTRY
@@ -12,4 +12,52 @@ MAX_PAGES_PER_QUERY = 1  # 1 Seite ≈ 10 Ergebnisse
 
 # Pfad für den Output: Ein Ordner über dem aktuellen Skript (../data)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DATA_DIR = os.path.join(BASE_DIR, "..", "data")
\ No newline at end of file
+DATA_DIR = os.path.join(BASE_DIR, "..", "data")
+
+# Parallelität im Batch-Modus (python -m scraper.main --cities ...)
+MAX_PARALLEL_PIPELINES = int(os.getenv("MAX_PARALLEL_PIPELINES", "4"))  # Stadt×Kategorie gleichzeitig
+MAX_CONCURRENT_ACTOR_RUNS = int(os.getenv("MAX_CONCURRENT_ACTOR_RUNS", "3"))  # Apify Actor-Runs gleichzeitig
+MAX_CONCURRENT_OPENAI_CALLS = int(os.getenv("MAX_CONCURRENT_OPENAI_CALLS", "4"))  # LLM Requests gleichzeitig
+
+# LLM Validierung
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4-turbo")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None  # z.B. lokaler Stub-Server: http://127.0.0.1:8080/v1
+MAX_AI_RETRIES = int(os.getenv("MAX_AI_RETRIES", "5"))
+
+# Validierungs-Cache (SQLite): gleicher Text + Anbieter + Modell -> gleiches Verdict, kein erneuter LLM-Call
+CACHE_DIR = os.path.join(DATA_DIR, ".cache")
+VALIDATION_CACHE_ENABLED = os.getenv("VALIDATION_CACHE", "1") != "0"
+VALIDATION_CACHE_PATH = os.getenv("VALIDATION_CACHE_PATH", os.path.join(CACHE_DIR, "validation.sqlite"))
+VALIDATION_CACHE_TTL_DAYS = float(os.getenv("VALIDATION_CACHE_TTL_DAYS", "30"))
+VALIDATION_CACHE_MAX_ENTRIES = int(os.getenv("VALIDATION_CACHE_MAX_ENTRIES", "50000"))
+
+# Inkrementeller Modus: bekannte Domains erst nach so vielen Tagen erneut scrapen
+RECHECK_AFTER_DAYS = float(os.getenv("RECHECK_AFTER_DAYS", "30"))
+
+# Apify Datasets seitenweise lesen + Textmenge begrenzen
+DATASET_PAGE_SIZE = int(os.getenv("DATASET_PAGE_SIZE", "100"))  # Items pro Request
+MAX_TEXT_PER_PAGE = 25000  # Zeichen pro gescrapter Unterseite
+MAX_TEXT_PER_CANDIDATE = 100000  # Zeichen pro Kandidat (alle Unterseiten zusammen)
+
+# Vorfilter vor der LLM-Validierung (relevance.py): nur die relevantesten Passagen ins Prompt
+RELEVANCE_TOKEN_BUDGET = int(os.getenv("RELEVANCE_TOKEN_BUDGET", "1500"))  # 0 = ganzer Text wie bisher
+RELEVANCE_WINDOW = int(os.getenv("RELEVANCE_WINDOW", "1"))  # Nachbarsätze je Seite pro Treffer
+RELEVANCE_SKIP_WITHOUT_HITS = os.getenv("RELEVANCE_SKIP_WITHOUT_HITS", "1") != "0"  # kein Begriff -> kein LLM-Call
+RULES_ENABLED = os.getenv("VALIDATION_RULES", "1") != "0"  # eindeutige Fälle per Regel (rules.py) statt LLM
+
+# Seiten-Cache für die Scrape-Stage (pages.py): frische Seiten nicht erneut scrapen
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE", "1") != "0"
+PAGE_CACHE_PATH = os.getenv("PAGE_CACHE_PATH", os.path.join(CACHE_DIR, "pages.sqlite"))
+PAGE_CACHE_TTL_DAYS = float(os.getenv("PAGE_CACHE_TTL_DAYS", "14"))
+
+# Scrape-Backend: "apify" (Cheerio-Actor, lokaler Fetch nur als Fallback) oder "local" (httpx)
+SCRAPE_BACKEND = os.getenv("SCRAPE_BACKEND", "apify")
+LOCAL_FETCH_CONCURRENCY = int(os.getenv("LOCAL_FETCH_CONCURRENCY", "8"))
+LOCAL_FETCH_TIMEOUT = float(os.getenv("LOCAL_FETCH_TIMEOUT", "15"))
+
+# Run-Journal: Checkpoints pro Stadt×Kategorie, damit abgebrochene Läufe per --resume weiterlaufen
+RUN_JOURNAL_ENABLED = os.getenv("RUN_JOURNAL", "1") != "0"
+RUN_JOURNAL_DIR = os.getenv("RUN_JOURNAL_DIR", os.path.join(DATA_DIR, ".runs"))
+
+# Versionierte Snapshots (snapshots.py): so viele veröffentlichte Versionen bleiben für Rollbacks liegen
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "5"))
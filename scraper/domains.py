@@ -0,0 +1,84 @@
+# Mehrteilige Public Suffixes, die im DACH-Umfeld (und bei internationalen Ketten) vorkommen.
+# Bewusst klein gehalten statt kompletter Public Suffix List: alles andere gilt als einteiliger TLD.
+MULTI_LABEL_SUFFIXES = {
+    "co.at", "or.at", "ac.at", "gv.at",
+    "co.uk", "org.uk", "ac.uk",
+    "com.au", "com.tr", "co.jp",
+}
+
+_END = object()  # Marker im Trie: hier endet eine Kandidaten-Domain
+
+def _labels(host):
+    host = (host or "").split(":", 1)[0].strip(".").lower()
+    return [l for l in host.split(".") if l]
+
+def public_suffix(host):
+    labels = _labels(host)
+    if len(labels) >= 2 and ".".join(labels[-2:]) in MULTI_LABEL_SUFFIXES:
+        return ".".join(labels[-2:])
+    return labels[-1] if labels else ""
+
+def registrable_domain(host):
+    """
+    "praxis.lab.co.at" -> "lab.co.at", "shop.lab.de" -> "lab.de". Reiner Suffix -> "".
+    """
+    labels = _labels(host)
+    n_suffix = len(public_suffix(host).split(".")) if labels else 0
+    if len(labels) <= n_suffix:
+        return ""
+    return ".".join(labels[-(n_suffix + 1):])
+
+class DomainIndex:
+    """
+    Trie über umgedrehte Domain-Labels ("shop.lab.de" -> de -> lab -> shop).
+
+    Pro Domain eine Liste von Werten: mehrere Anbieter können dieselbe Website haben
+    (Ärztehaus, Praxisgemeinschaft). match(host) liefert die Liste der längsten passenden Domain:
+    - exakt gleich oder Subdomain einer Kandidaten-Domain ("shop.lab.de" -> "lab.de")
+    - "mylab.de" passt NICHT zu "lab.de" (Label-Grenzen statt Substring-Vergleich)
+    - Fallback: gleiche registrierbare Domain, wenn genau eine Kandidaten-Domain dazu gehört
+      ("lab.de" -> Kandidaten von "praxis.lab.de")
+    Kosten pro Lookup: O(Anzahl Labels), unabhängig von der Zahl der Kandidaten.
+    """
+
+    def __init__(self, items=()):
+        """
+        items: (domain, wert)-Paare, dieselbe Domain darf mehrfach vorkommen.
+        """
+        self._root = {}
+        self._by_registrable = {}
+        for domain, value in items:
+            self.add(domain, value)
+
+    def add(self, domain, value):
+        labels = _labels(domain)
+        reg = registrable_domain(domain)
+        if not labels or not reg:
+            # Reiner Public Suffix ("co.at") würde sonst auf alles passen
+            return
+        node = self._root
+        for label in reversed(labels):
+            node = node.setdefault(label, {})
+        values = node.get(_END)
+        if values is None:
+            values = node[_END] = []
+            self._by_registrable.setdefault(reg, []).append(values)
+        values.append(value)
+
+    def match(self, host):
+        node = self._root
+        best = None
+        for label in reversed(_labels(host)):
+            node = node.get(label)
+            if node is None:
+                break
+            if _END in node:
+                best = node[_END]
+        if best is not None:
+            return best
+
+        siblings = self._by_registrable.get(registrable_domain(host), [])
+        return siblings[0] if len(siblings) == 1 else None
+
+    def __contains__(self, host):
+        return self.match(host) is not None
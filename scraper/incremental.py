@@ -0,0 +1,115 @@
+import os
+import json
+import math
+from datetime import datetime, timezone, timedelta
+import pandas as pd
+from .config import DATA_DIR
+from .snapshots import current_dir
+
+# Felder, die das Verdict ausmachen und bei unveränderten Domains übernommen werden
+VERDICT_FIELDS = ("status", "reason", "evidence_quote", "validated_at", "content_hash")
+
+# Verdicts, die keine echte Entscheidung sind -> immer erneut versuchen
+_NON_FINAL_REASONS = ("Kein Text gescrapt", "AI Error")
+
+def _clean(value):
+    # pandas liefert für leere CSV-Zellen NaN
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+def load_previous(city, category):
+    """
+    Lädt VALID JSON + REJECTED CSV des letzten Laufs (aktueller Snapshot), indiziert nach Domain und (Domain, Name).
+    """
+    previous = {}
+    data_dir = current_dir(DATA_DIR)
+
+    rejected_path = os.path.join(data_dir, f"{city}_{category}_REJECTED.csv")
+    if os.path.exists(rejected_path):
+        for row in pd.read_csv(rejected_path, dtype=str).to_dict("records"):
+            row = {k: _clean(v) for k, v in row.items()}
+            if row.get("domain"):
+                _remember(previous, row)
+
+    valid_path = os.path.join(data_dir, f"{city}_{category}_VALID.json")
+    if os.path.exists(valid_path):
+        with open(valid_path, "r", encoding="utf-8") as f:
+            for row in json.load(f):
+                if isinstance(row, dict) and row.get("domain"):
+                    _remember(previous, row)
+
+    return previous
+
+def _remember(previous, row):
+    # Filialen einer Domain (gleiche Website, andere Standorte) zusätzlich nach Name
+    previous[row["domain"]] = row
+    previous[(row["domain"], row.get("name"))] = row
+
+def lookup(previous, cand):
+    """
+    Vorheriger Datensatz zum Kandidaten: gleiche Filiale (Domain + Name), sonst gleiche Domain.
+    """
+    if not previous:
+        return None
+    return previous.get((cand["domain"], cand.get("name"))) or previous.get(cand["domain"])
+
+def is_final(record):
+    reason = str(record.get("reason") or "")
+    return bool(record.get("status")) and not reason.startswith(_NON_FINAL_REASONS)
+
+def _parse_ts(value):
+    try:
+        ts = datetime.fromisoformat(str(value))
+    except (TypeError, ValueError):
+        return None
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+def plan(candidates, previous, recheck_after_days):
+    """
+    Teilt frisch gefundene Kandidaten auf:
+    - carried: bekannte Domain, gleiche Discovery-Daten, finales Verdict, zuletzt vor < recheck_after_days geprüft
+      -> Verdict wird ohne Scrape/LLM übernommen
+    - to_scrape: neue Domains, geänderte Discovery-Daten, nicht-finale oder fällige Verdicts
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(days=recheck_after_days)
+    carried, to_scrape = [], []
+
+    for cand in candidates:
+        prev = lookup(previous, cand)
+        discovery_changed = prev is not None and not same_discovery(cand, prev)
+        checked_at = _parse_ts(prev.get("content_checked_at") or prev.get("validated_at")) if prev else None
+
+        if prev is None or discovery_changed or not is_final(prev) or checked_at is None or checked_at < cutoff:
+            to_scrape.append(cand)
+        else:
+            carry_forward(cand, prev)
+            carried.append(cand)
+
+    return carried, to_scrape
+
+def same_discovery(cand, prev):
+    return prev.get("name") == cand["name"] and prev.get("website") == cand["website"]
+
+def content_unchanged(cand, prev):
+    """
+    Gleicher Seiteninhalt + gleiche Discovery-Daten -> gleicher Prompt -> altes Verdict gilt weiter.
+    """
+    return (
+        prev is not None
+        and bool(cand.get("content_hash"))
+        and prev.get("content_hash") == cand["content_hash"]
+        and same_discovery(cand, prev)
+        and is_final(prev)
+    )
+
+def carry_forward(cand, prev):
+    """
+    Übernimmt das alte Verdict (inkl. ursprünglichem validated_at) in den frischen Discovery-Datensatz.
+    Adresse, Telefon, Koordinaten kommen aus der aktuellen Discovery.
+    """
+    for field in VERDICT_FIELDS:
+        if prev.get(field) is not None:
+            cand[field] = prev[field]
+    cand["content_checked_at"] = prev.get("content_checked_at") or prev.get("validated_at")
+    return cand
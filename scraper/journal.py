@@ -0,0 +1,141 @@
+"""
+Run-Journal: Checkpoints eines Laufs, damit ein abgebrochener Batch per --resume weiterläuft,
+ohne bezahlte Arbeit (Actor-Runs, LLM-Calls) zu wiederholen.
+
+Layout:
+    <RUN_JOURNAL_DIR>/<run_id>/run.json              -> Argumente des Laufs (Städte, Kategorien, ...)
+    <RUN_JOURNAL_DIR>/<run_id>/<Stadt>_<KAT>.jsonl   -> eine Zeile pro abgeschlossener Einheit
+
+Einheiten pro Stadt×Kategorie:
+    actor:<actor>:<hash(input)>   Dataset-ID eines erfolgreichen Actor-Runs (wird beim Resume wiederverwendet)
+    candidates                    Discovery-Ergebnis
+    search:<hash(input)>          gefilterte Deep-Links der Google-Suche
+    content:<website>             gescrapter Text einer Website ("" = nichts gefunden)
+    cluster:<label>               Verdict, das eine andere Pipeline für diesen Cluster geliefert hat
+    verdict:<kind>:<website>:<content_hash>   ein Verdict, sobald es vorliegt
+    done                          Ergebnis gespeichert, Job wird beim Resume übersprungen
+
+Append-only JSONL mit fsync pro Zeile: ein Absturz kostet höchstens die halb geschriebene letzte Zeile.
+"""
+import os
+import re
+import json
+import shutil
+import hashlib
+import threading
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from .config import RUN_JOURNAL_DIR
+
+_ctx = threading.local()
+_UNSAFE_RE = re.compile(r"[^\w.-]+")
+
+def digest(obj):
+    raw = json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+def new_run_id():
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ") + "-" + os.urandom(2).hex()
+
+class JobJournal:
+    """
+    Checkpoints einer Stadt×Kategorie-Pipeline. Wird nur aus deren Thread benutzt.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.units = {}
+        self.resumed = 0
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # abgebrochene letzte Zeile
+                    self.units[entry["unit"]] = entry["value"]
+        self._f = open(path, "a", encoding="utf-8")
+
+    def get(self, unit, default=None):
+        if unit in self.units:
+            self.resumed += 1
+            return self.units[unit]
+        return default
+
+    def __contains__(self, unit):
+        return unit in self.units
+
+    def put(self, unit, value):
+        self.units[unit] = value
+        self._f.write(json.dumps({"unit": unit, "value": value}, ensure_ascii=False) + "\n")
+        self._f.flush()
+        os.fsync(self._f.fileno())
+
+    def checkpoint(self, unit, compute):
+        """
+        Ergebnis der Einheit aus dem Journal, sonst compute() ausführen und festhalten.
+        """
+        if unit in self.units:
+            return self.get(unit)
+        value = compute()
+        self.put(unit, value)
+        return value
+
+    def close(self):
+        self._f.close()
+
+class RunJournal:
+    def __init__(self, run_id, root=RUN_JOURNAL_DIR):
+        self.run_id = run_id
+        self.dir = os.path.join(root, run_id)
+
+    @classmethod
+    def create(cls, meta, root=RUN_JOURNAL_DIR):
+        journal = cls(new_run_id(), root)
+        os.makedirs(journal.dir, exist_ok=True)
+        with open(os.path.join(journal.dir, "run.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        return journal
+
+    @classmethod
+    def open(cls, run_id, root=RUN_JOURNAL_DIR):
+        """
+        Bestehender Lauf. Wirft FileNotFoundError bei unbekannter Run-ID.
+        """
+        journal = cls(run_id, root)
+        if not os.path.exists(os.path.join(journal.dir, "run.json")):
+            raise FileNotFoundError(f"Kein Run-Journal für '{run_id}' in {root}")
+        return journal
+
+    def meta(self):
+        with open(os.path.join(self.dir, "run.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def job(self, city, category):
+        name = _UNSAFE_RE.sub("_", f"{city}_{category}")
+        return JobJournal(os.path.join(self.dir, f"{name}.jsonl"))
+
+    def remove(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+@contextmanager
+def use(job):
+    """
+    Setzt das Journal der Pipeline im aktuellen Thread (siehe current()).
+    """
+    old = getattr(_ctx, "job", None)
+    _ctx.job = job
+    try:
+        yield job
+    finally:
+        _ctx.job = old
+
+def current():
+    """
+    Journal der laufenden Pipeline, None ohne Journal (z.B. Benchmark, RUN_JOURNAL=0).
+    """
+    return getattr(_ctx, "job", None)
+
+def checkpoint(unit, compute):
+    job = current()
+    return compute() if job is None else job.checkpoint(unit, compute)
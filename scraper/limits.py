@@ -0,0 +1,31 @@
+import threading
+from contextlib import contextmanager
+from .config import MAX_CONCURRENT_ACTOR_RUNS, MAX_CONCURRENT_OPENAI_CALLS
+
+# Prozessweite Slots pro Stage. Alle Pipelines (Threads) teilen sich diese,
+# damit N parallele Städte nicht N× so viele Actor-Runs / LLM-Calls starten.
+apify_slots = threading.BoundedSemaphore(MAX_CONCURRENT_ACTOR_RUNS)
+openai_slots = threading.BoundedSemaphore(MAX_CONCURRENT_OPENAI_CALLS)
+
+
+def configure(actor_runs=None, openai_calls=None):
+    """
+    Setzt die Limits neu (z.B. aus CLI-Argumenten). Muss vor dem Start der Pipelines laufen.
+    """
+    global apify_slots, openai_slots
+    if actor_runs:
+        apify_slots = threading.BoundedSemaphore(actor_runs)
+    if openai_calls:
+        openai_slots = threading.BoundedSemaphore(openai_calls)
+
+
+@contextmanager
+def apify_slot():
+    with apify_slots:
+        yield
+
+
+@contextmanager
+def openai_slot():
+    with openai_slots:
+        yield
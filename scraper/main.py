@@ -1,92 +1,445 @@
 import os
+import sys
 import json
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
-from .config import DATA_DIR
+from .config import DATA_DIR, MAX_PARALLEL_PIPELINES, RECHECK_AFTER_DAYS, RUN_JOURNAL_ENABLED
+from . import limits, incremental, metrics, replay, clusters, journal
+from . import scraper as scraping, validator as validation
+from .journal import RunJournal
+from .snapshots import Staging
+from .storage import write_compact
+from .utils import content_hash, utc_now
 from .scraper import find_places_discovery, sniper_search_and_scrape
-from .validator import validate_dexa, validate_blood
+from .validator import validate_batch
 
-def run_pipeline(city, country_code, category, queries, keywords, validate_func):
+def _scrape_content(reps, keywords, country_code):
+    """
+    content_map für die Repräsentanten. Checkpoints gibt es pro Website: beim Resume werden nur
+    Websites ohne Checkpoint gescrapt, egal wie sich die Cluster diesmal verteilen.
+    """
+    job = journal.current()
+    if job is None:
+        return sniper_search_and_scrape(reps, keywords, country_code)
+    content_map = {}
+    pending = []
+    for cand in reps:
+        text = job.get(f"content:{cand['website']}")
+        if text is None:
+            pending.append(cand)
+        elif text:
+            content_map[cand["website"]] = text
+    if pending:
+        scraped = sniper_search_and_scrape(pending, keywords, country_code)
+        for cand in pending:
+            # Auch "kein Text" festhalten, sonst wird die Website beim Resume erneut gescrapt
+            text = scraped.get(cand["website"], "")
+            job.put(f"content:{cand['website']}", text)
+            if text:
+                content_map[cand["website"]] = text
+    return content_map
+
+def _scrape_and_validate(reps, keywords, country_code, validator, previous, carried):
+    """
+    Sniper-Scrape + Validierung für die Repräsentanten der Cluster (Verdict landet im Kandidaten).
+    """
+    # 2. Relevante Texte scrapen (Sniper-Methode), beim Resume aus dem Run-Journal
+    content_map = _scrape_content(reps, keywords, country_code)
+
+    # 2b. Seiteninhalt unverändert -> altes Verdict (mit ursprünglichem Zeitstempel) behalten
+    now = utc_now()
+    to_validate = []
+    for cand in reps:
+        cand["content_hash"] = content_hash(content_map.get(cand["website"], ""))
+        prev = incremental.lookup(previous, cand)
+        if incremental.content_unchanged(cand, prev):
+            incremental.carry_forward(cand, prev)
+            carried.append(cand)
+        else:
+            to_validate.append(cand)
+        cand["content_checked_at"] = now
+
+    # 2c. Resume: Verdicts, die vor dem Abbruch schon vorlagen, nicht erneut anfragen
+    job = journal.current()
+    units = {id(c): f"verdict:{validator}:{c['website']}:{c['content_hash']}" for c in to_validate}
+    if job is not None:
+        pending = []
+        for cand in to_validate:
+            res = job.get(units[id(cand)])
+            if res is None:
+                pending.append(cand)
+            else:
+                cand.update(res)
+                cand["validated_at"] = now
+        if len(pending) < len(to_validate):
+            print(f"\n🧾 RESUME: {len(to_validate) - len(pending)} Verdict(s) aus dem Run-Journal")
+        to_validate = pending
+
+    def checkpoint_verdict(i, res):
+        # Jedes Verdict sofort festhalten; Fehler (AI Error) beim Resume erneut versuchen
+        if job is not None and incremental.is_final(res):
+            job.put(units[id(to_validate[i])], res)
+
+    # 3. Validierung durch AI
+    print(f"\n🧠 VALIDIERE {len(to_validate)} Kandidaten ({len(carried)} übernommen)...")
+    print(f"{'-'*80}")
+    print(f"{'NAME':<40} | {'STATUS':<12} | {'QUOTE'}")
+    print(f"{'-'*80}")
+
+    # Alle LLM-Calls gleichzeitig (begrenzt), Ergebnisse in Kandidaten-Reihenfolge
+    with metrics.RUN.stage("validate") as m:
+        verdicts = validate_batch(
+            validator,
+            [(content_map.get(c["website"], ""), c["name"]) for c in to_validate],
+            on_result=checkpoint_verdict,
+        )
+        m.update(candidates=len(to_validate), carried=len(carried))
+
+    for cand, res in zip(to_validate, verdicts):
+        cand.update(res)
+        cand["validated_at"] = now
+
+_SHARED_FIELDS = incremental.VERDICT_FIELDS + ("content_checked_at",)
+
+def _shared_unit(group, country_code):
+    return f"cluster:{clusters.label(group, country_code)}"
+
+def run_pipeline(city, country_code, category, queries, keywords, validator, previous=None,
+                 recheck_after_days=RECHECK_AFTER_DAYS):
+    """
+    previous: Datensätze des letzten Laufs nach Domain (incremental.load_previous) -> inkrementeller Modus.
+    """
     print(f"\n{'='*60}")
     print(f"🚀 START PIPELINE: {category} in {city} ({country_code.upper()})")
     print(f"{'='*60}")
 
-    # 1. Kandidaten finden
-    candidates = find_places_discovery(city, queries)
+    # 1. Kandidaten finden (beim Resume aus dem Run-Journal)
+    candidates = journal.checkpoint("candidates", lambda: find_places_discovery(city, queries))
 
-    # 2. Relevante Texte scrapen (Sniper-Methode)
-    content_map = sniper_search_and_scrape(candidates, keywords, country_code)
+    # 1b. Inkrementell: bekannte Domains mit unveränderten Discovery-Daten gar nicht erst scrapen
+    carried, to_scrape = [], candidates
+    if previous is not None:
+        carried, to_scrape = incremental.plan(candidates, previous, recheck_after_days)
+        print(f"\n♻️ INKREMENTELL: {len(carried)} übernommen, {len(to_scrape)} neu/geändert/fällig")
+
+    # 1c. Filialen/Ketten bündeln: Suche, Scrape und LLM nur einmal pro Cluster,
+    #     auch über Städte hinweg (andere Pipelines derselben Kategorie im Batch)
+    groups = clusters.group(to_scrape, country_code)
+
+    # Resume: Verdicts, die eine andere (evtl. schon abgeschlossene) Pipeline geliefert hatte
+    job = journal.current()
+    restored = []
+    if job is not None:
+        restored = [g for g in groups if _shared_unit(g, country_code) in job]
+        groups = [g for g in groups if _shared_unit(g, country_code) not in job]
+    own, shared = clusters.REGISTRY.claim(category, groups, country_code)
+    metrics.RUN.add("clusters", candidates=len(to_scrape), clusters=len(groups), own=len(own), shared=len(shared))
+    print(f"\n🔗 CLUSTER: {len(to_scrape)} Kandidaten -> {len(groups)} Cluster ({len(shared)} aus anderen Pipelines)")
+
+    try:
+        _scrape_and_validate([g[0] for _, g in own], keywords, country_code, validator, previous, carried)
+    except BaseException:
+        for entry, _ in own:
+            entry.abandon()
+        raise
+    fanned = []
+    for entry, group in own:
+        entry.publish(group[0])
+        fanned += clusters.fan_out(group[0], group, country_code)
+
+    # Cluster, die eine andere Pipeline bearbeitet: Verdict übernehmen (oder selbst machen, falls sie scheiterte)
+    leftovers = []
+    for entry, group in shared:
+        rep = clusters.REGISTRY.wait(entry)
+        if rep is None:
+            leftovers.append(group)
+            continue
+        if job is not None:
+            job.put(_shared_unit(group, country_code), {f: rep[f] for f in _SHARED_FIELDS if f in rep})
+        fanned += clusters.fan_out(rep, group, country_code)
+    for group in restored:
+        fanned += clusters.fan_out(job.get(_shared_unit(group, country_code)), group, country_code)
+    if leftovers:
+        _scrape_and_validate([g[0] for g in leftovers], keywords, country_code, validator, previous, carried)
+        for group in leftovers:
+            fanned += clusters.fan_out(group[0], group, country_code)
 
-    # 3. Validierung durch AI
     valid_results = []
     rejected_results = []
 
-    print(f"\n🧠 VALIDIERE {len(candidates)} Kandidaten...")
-    print(f"{'-'*80}")
-    print(f"{'NAME':<40} | {'STATUS':<12} | {'QUOTE'}")
-    print(f"{'-'*80}")
-
+    carried_ids = {id(c) for c in carried}
+    fanned_ids = {id(c) for c in fanned}
     for cand in candidates:
-        text = content_map.get(cand["website"], "")
-        res = validate_func(text, cand["name"])
+        marker = "♻️" if id(cand) in carried_ids else ("🔗" if id(cand) in fanned_ids else "")
 
-        cand.update(res)
-        
         # Output formatieren für bessere Lesbarkeit
-        quote = (res.get("evidence_quote") or "")
+        quote = (cand.get("evidence_quote") or "")
         quote_snippet = (quote[:40].replace("\n", " ") + "...") if quote else ""
         
-        if res["status"] == "YES":
-            print(f"✅ {cand['name'][:38]:<38} | YES          | {quote_snippet}")
+        if cand["status"] == "YES":
+            print(f"✅ {cand['name'][:38]:<38} | YES          | {quote_snippet} {marker}")
             valid_results.append(cand)
         else:
-            print(f"❌ {cand['name'][:38]:<38} | {res['status']:<12} | {res.get('reason', '')}")
+            print(f"❌ {cand['name'][:38]:<38} | {cand['status']:<12} | {cand.get('reason') or ''} {marker}")
             rejected_results.append(cand)
 
     return valid_results, rejected_results
 
-def main():
-    city = input("Stadt (z.B. Berlin / Wien / Zürich): ").strip()
-    country_code = input("Ländercode (de/at/ch): ").strip().lower()
+# Kategorie -> Suchanfragen (Google Places), Sniper-Keywords und Validator (siehe validator.PROMPT_BUILDERS)
+PIPELINES = {
+    "DEXA": {
+        "queries": ["{city} DEXA Body Scan", "{city} DXA Scan", "{city} DEXA Körperanalyse"],
+        "keywords": ["Körperfett", "Muskelmasse", "Body Composition", "Viszeralfett", "DXA", "Weichteilanalyse"],
+        "validator": "dexa",
+    },
+    "BLOOD": {
+        "queries": ["{city} Privatlabor", "{city} Blutabnahme Selbstzahler", "{city} Direktlabor"],
+        "keywords": ["Selbstzahler", "ohne Überweisung", "Preisliste", "Health Check", "Direktlabor"],
+        "validator": "blood",
+    },
+}
 
-    if not city or country_code not in {"de", "at", "ch"}:
-        print("❌ Ungültige Eingabe.")
-        return
+COUNTRY_CODES = {"de", "at", "ch"}
 
-    # Sicherstellen, dass der ../data Ordner existiert
-    os.makedirs(DATA_DIR, exist_ok=True)
-    print(f"📂 Speicherort für Daten: {os.path.abspath(DATA_DIR)}")
+def save_results(city, category, valid, rejected, out_dir=DATA_DIR):
+    """
+    out_dir: im Batch das Staging-Verzeichnis des nächsten Snapshots (snapshots.py),
+    das Backend sieht die Dateien erst nach dem Publish.
+    """
+    with open(os.path.join(out_dir, f"{city}_{category}_VALID.json"), "w", encoding="utf-8") as f:
+        json.dump(valid, f, indent=2, ensure_ascii=False)
 
-    # --- DEXA SUCHE ---
-    dexa_valid, dexa_rejected = run_pipeline(
-        city, country_code, "DEXA",
-        queries=[f"{city} DEXA Body Scan", f"{city} DXA Scan", f"{city} DEXA Körperanalyse"],
-        keywords=["Körperfett", "Muskelmasse", "Body Composition", "Viszeralfett", "DXA", "Weichteilanalyse"],
-        validate_func=validate_dexa
-    )
+    # Kompakte Kopie fürs Backend (providers.sqlite)
+    write_compact(city, category, valid, data_dir=out_dir)
 
-    # Speichern
-    with open(os.path.join(DATA_DIR, f"{city}_DEXA_VALID.json"), "w", encoding="utf-8") as f:
-        json.dump(dexa_valid, f, indent=2, ensure_ascii=False)
-    
     # Abgelehnte speichern wir als CSV, falls wir manuell drüberschauen wollen
-    if dexa_rejected:
-        pd.DataFrame(dexa_rejected).to_csv(os.path.join(DATA_DIR, f"{city}_DEXA_REJECTED.csv"), index=False)
-
-    # --- BLUTLABOR SUCHE ---
-    blood_valid, blood_rejected = run_pipeline(
-        city, country_code, "BLOOD",
-        queries=[f"{city} Privatlabor", f"{city} Blutabnahme Selbstzahler", f"{city} Direktlabor"],
-        keywords=["Selbstzahler", "ohne Überweisung", "Preisliste", "Health Check", "Direktlabor"],
-        validate_func=validate_blood
+    if rejected:
+        pd.DataFrame(rejected).to_csv(os.path.join(out_dir, f"{city}_{category}_REJECTED.csv"), index=False)
+
+def run_job(city, country_code, category, incremental_mode=False, recheck_after_days=RECHECK_AFTER_DAYS,
+            run_journal=None, out_dir=DATA_DIR):
+    """
+    Eine Stadt × Kategorie: Pipeline laufen lassen und Ergebnis nach out_dir speichern.
+    run_journal: Checkpoints des Laufs; ein bereits gespeicherter Job wird beim Resume übersprungen.
+    """
+    job = run_journal.job(city, category) if run_journal is not None else None
+    try:
+        if job is not None and "done" in job:
+            print(f"🧾 {city} {category}: bereits abgeschlossen, übersprungen")
+            return tuple(job.get("done"))
+        with journal.use(job):
+            n_valid, n_rejected = _run_job(city, country_code, category, incremental_mode, recheck_after_days, out_dir)
+        if job is not None:
+            job.put("done", [n_valid, n_rejected])
+        return n_valid, n_rejected
+    finally:
+        if job is not None:
+            job.close()
+
+def _run_job(city, country_code, category, incremental_mode, recheck_after_days, out_dir):
+    spec = PIPELINES[category]
+    with metrics.labels(city=city, category=category), metrics.RUN.stage("pipeline") as m:
+        previous = incremental.load_previous(city, category) if incremental_mode else None
+        valid, rejected = run_pipeline(
+            city, country_code, category,
+            queries=[q.format(city=city) for q in spec["queries"]],
+            keywords=spec["keywords"],
+            validator=spec["validator"],
+            previous=previous,
+            recheck_after_days=recheck_after_days,
+        )
+        save_results(city, category, valid, rejected, out_dir)
+        m.update(valid=len(valid), rejected=len(rejected))
+    return len(valid), len(rejected)
+
+def parse_city(raw):
+    """
+    "Berlin:de" -> ("Berlin", "de"). Wirft ValueError bei ungültigem Format/Ländercode.
+    """
+    city, sep, country_code = raw.strip().rpartition(":")
+    city, country_code = city.strip(), country_code.strip().lower()
+    if not sep or not city or country_code not in COUNTRY_CODES:
+        raise ValueError(f"Ungültige Stadt-Angabe '{raw}' (erwartet z.B. Berlin:de)")
+    return city, country_code
+
+def read_city_file(path):
+    """
+    Eine Stadt pro Zeile im Format "Stadt:ländercode". Leere Zeilen und # Kommentare werden ignoriert.
+    """
+    cities = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                cities.append(parse_city(line))
+    return cities
+
+def run_batch(cities, categories, parallel, **job_kwargs):
+    """
+    Führt alle Stadt×Kategorie-Pipelines parallel aus (max. `parallel` gleichzeitig).
+    Ein Fehler in einer Pipeline bricht die anderen nicht ab.
+    """
+    jobs = [(city, cc, cat) for city, cc in cities for cat in categories]
+    print(f"🧵 {len(jobs)} Pipeline(s), max. {parallel} parallel")
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=parallel) as pool:
+        futures = {pool.submit(run_job, *job, **job_kwargs): job for job in jobs}
+        for fut in as_completed(futures):
+            city, _, cat = futures[fut]
+            try:
+                n_valid, n_rejected = fut.result()
+                print(f"✅ {city} {cat}: {n_valid} valide, {n_rejected} abgelehnt")
+            except Exception as e:
+                print(f"❌ {city} {cat}: {e}")
+                failed.append(futures[fut])
+    return failed
+
+def write_run_report(prometheus_path=None, out_dir=DATA_DIR):
+    """
+    Stage-Metriken des Laufs: Zusammenfassung auf der Konsole + JSON-Report neben den Datensätzen.
+    """
+    run = metrics.RUN
+    run.print_summary()
+    stamp = run.started_at.replace(":", "").replace("-", "").replace("+0000", "Z")
+    path = os.path.join(out_dir, f"run_report_{stamp}.json")
+    run.write_json(path)
+    print(f"📝 Run-Report: {path}")
+    if prometheus_path:
+        with open(prometheus_path, "w", encoding="utf-8") as f:
+            f.write(run.to_prometheus())
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Laborsuche DACH Scraper")
+    parser.add_argument("--cities", nargs="+", metavar="STADT:LAND",
+                        help="Batch-Modus, z.B. --cities Berlin:de Wien:at Zürich:ch")
+    parser.add_argument("--cities-file", metavar="DATEI",
+                        help="Datei mit einer Stadt pro Zeile (Stadt:ländercode)")
+    parser.add_argument("--categories", nargs="+", choices=list(PIPELINES), default=list(PIPELINES))
+    parser.add_argument("--parallel", type=int, default=MAX_PARALLEL_PIPELINES,
+                        help="Max. gleichzeitige Stadt×Kategorie-Pipelines")
+    parser.add_argument("--max-actor-runs", type=int, default=None,
+                        help="Max. gleichzeitige Apify Actor-Runs (alle Pipelines zusammen)")
+    parser.add_argument("--max-openai-calls", type=int, default=None,
+                        help="Max. gleichzeitige OpenAI Requests (alle Pipelines zusammen)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Nur neue/geänderte Domains scrapen + validieren, Rest vom letzten Lauf übernehmen")
+    parser.add_argument("--recheck-after-days", type=float, default=RECHECK_AFTER_DAYS,
+                        help="Inkrementell: bekannte Domains nach so vielen Tagen erneut scrapen")
+    parser.add_argument("--prometheus", metavar="DATEI",
+                        help="Metriken zusätzlich im Prometheus Text-Format schreiben")
+    offline = parser.add_mutually_exclusive_group()
+    offline.add_argument("--record", metavar="ORDNER",
+                         help="Actor-Datasets + LLM-Antworten als Fixtures aufnehmen")
+    offline.add_argument("--replay", metavar="ORDNER",
+                         help="Ohne Apify/OpenAI laufen, Antworten aus aufgenommenen Fixtures")
+    parser.add_argument("--replay-latency-ms", type=float, default=0.0,
+                        help="Replay: künstliche Latenz pro Actor-Run bzw. LLM-Call")
+    parser.add_argument("--resume", metavar="RUN_ID",
+                        help="Abgebrochenen Lauf fortsetzen (Städte/Kategorien/Optionen wie beim ersten Start)")
+    return parser.parse_args(argv)
+
+def open_run_journal(args, cities):
+    """
+    Neues Run-Journal für den Lauf bzw. das bestehende bei --resume.
+    -> (journal oder None, Städte). Beim Resume gelten Städte und Optionen des ursprünglichen Laufs.
+    """
+    if args.resume:
+        run_journal = RunJournal.open(args.resume)
+        meta = run_journal.meta()
+        args.categories = meta["categories"]
+        args.incremental = meta["incremental"]
+        args.recheck_after_days = meta["recheck_after_days"]
+        return run_journal, [tuple(c) for c in meta["cities"]]
+    if not RUN_JOURNAL_ENABLED:
+        return None, cities
+    run_journal = RunJournal.create({
+        "cities": cities,
+        "categories": args.categories,
+        "incremental": args.incremental,
+        "recheck_after_days": args.recheck_after_days,
+    })
+    return run_journal, cities
+
+def main(argv=None):
+    args = parse_args(argv)
+    limits.configure(actor_runs=args.max_actor_runs, openai_calls=args.max_openai_calls)
+    if args.record:
+        replay.install("record", args.record)
+    elif args.replay:
+        latency = args.replay_latency_ms / 1000
+        replay.install("replay", args.replay, actor_latency_s=latency, llm_latency_s=latency)
+
+    try:
+        if args.resume and args.replay:
+            raise ValueError("--resume und --replay lassen sich nicht kombinieren")
+        cities = [parse_city(c) for c in (args.cities or [])]
+        if args.cities_file:
+            cities += read_city_file(args.cities_file)
+        if args.resume:
+            run_journal, cities = open_run_journal(args, cities)
+    except (ValueError, OSError) as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+    if not cities:
+        # Interaktiver Modus wie bisher: eine Stadt
+        city = input("Stadt (z.B. Berlin / Wien / Zürich): ").strip()
+        country_code = input("Ländercode (de/at/ch): ").strip().lower()
+
+        if not city or country_code not in COUNTRY_CODES:
+            print("❌ Ungültige Eingabe.")
+            return
+        cities = [(city, country_code)]
+
+    if args.replay:
+        # Replay: kein Journal, kein Snapshot – die echten Daten bleiben unberührt
+        out_dir = tempfile.mkdtemp(prefix="laborsuche-replay-")
+        run_journal = staging = None
+    else:
+        # Sicherstellen, dass der ../data Ordner existiert
+        os.makedirs(DATA_DIR, exist_ok=True)
+        out_dir = DATA_DIR
+        if not args.resume:
+            run_journal, cities = open_run_journal(args, cities)
+        if run_journal is not None:
+            print(f"🧾 Run-ID: {run_journal.run_id}")
+        # Ergebnisse landen erst im Staging und werden am Ende als neuer Snapshot veröffentlicht
+        staging = Staging(run_journal.run_id if run_journal is not None else journal.new_run_id())
+    print(f"📂 Speicherort für Daten: {os.path.abspath(out_dir)}")
+
+    failed = run_batch(
+        cities, args.categories, max(1, args.parallel),
+        incremental_mode=args.incremental, recheck_after_days=args.recheck_after_days,
+        run_journal=run_journal, out_dir=staging.dir if staging is not None else out_dir,
     )
+    jobs = len(cities) * len(args.categories)
+    if staging is not None and len(failed) < jobs:
+        print(f"\n📦 Snapshot veröffentlicht: {staging.publish()}")
+    elif staging is not None and run_journal is None:
+        staging.discard()
+
+    # Über die Module aufrufen: replay.install ersetzt die Caches dort (standardmäßig durch None)
+    for cache in (validation.get_cache(), scraping.get_page_store()):
+        if cache is not None:
+            print(f"\n{cache.stats_line()}")
+            cache.close()
+
+    write_run_report(args.prometheus, out_dir)
 
-    with open(os.path.join(DATA_DIR, f"{city}_BLOOD_VALID.json"), "w", encoding="utf-8") as f:
-        json.dump(blood_valid, f, indent=2, ensure_ascii=False)
+    if failed:
+        print(f"\n⚠️ {len(failed)} Pipeline(s) fehlgeschlagen: " + ", ".join(f"{c} {k}" for c, _, k in failed))
+        if run_journal is not None:
+            print(f"   Fortsetzen mit: python -m scraper.main --resume {run_journal.run_id}")
+        sys.exit(1)
 
-    if blood_rejected:
-        pd.DataFrame(blood_rejected).to_csv(os.path.join(DATA_DIR, f"{city}_BLOOD_REJECTED.csv"), index=False)
+    # Alles gespeichert -> Checkpoints werden nicht mehr gebraucht
+    if run_journal is not None:
+        run_journal.remove()
 
-    print(f"\n🏁 FERTIG. Daten liegen in {DATA_DIR}")
+    print(f"\n🏁 FERTIG. Daten liegen in {out_dir}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,157 @@
+import re
+import json
+import time
+import threading
+from contextlib import contextmanager
+from .utils import utc_now
+
+# Pipeline-Kontext (Stadt/Kategorie) pro Thread, damit Stages ohne extra Parameter
+# der richtigen Pipeline zugeordnet werden. Async-Validierung läuft im selben Thread.
+_ctx = threading.local()
+
+@contextmanager
+def labels(**kwargs):
+    old = getattr(_ctx, "labels", {})
+    _ctx.labels = {**old, **kwargs}
+    try:
+        yield
+    finally:
+        _ctx.labels = old
+
+def current_labels():
+    return dict(getattr(_ctx, "labels", {}))
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100.0
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+class StageStats:
+    def __init__(self):
+        self.durations = []  # Sekunden pro Aufruf
+        self.counters = {}
+
+    def add(self, duration=None, **counters):
+        if duration is not None:
+            self.durations.append(duration)
+        for k, v in counters.items():
+            if v is not None:
+                self.counters[k] = self.counters.get(k, 0) + v
+
+    def summary(self):
+        d = self.durations
+        out = {
+            "calls": len(d),
+            "wall_s": round(sum(d), 3),
+            **{k: (round(v, 4) if isinstance(v, float) else v) for k, v in sorted(self.counters.items())},
+        }
+        if d:
+            for p in (50, 90, 95, 99):
+                out[f"p{p}_s"] = round(percentile(d, p), 3)
+            out["max_s"] = round(max(d), 3)
+        return out
+
+class RunMetrics:
+    """
+    Sammelt pro Stage (discovery, search, scrape, llm, ...) und Pipeline (Stadt/Kategorie):
+    Laufzeiten, Item-Zahlen, Textmengen, Tokens, Retries, Apify Compute Units.
+    Thread-safe, da mehrere Pipelines parallel laufen.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = utc_now()
+        self._t0 = time.perf_counter()
+        self._stages = {}  # (stage, city, category) -> StageStats
+
+    def add(self, stage, duration=None, **counters):
+        lbl = current_labels()
+        key = (stage, lbl.get("city", ""), lbl.get("category", ""))
+        with self._lock:
+            self._stages.setdefault(key, StageStats()).add(duration, **counters)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Misst die Wall-Time eines Blocks. Zähler können über das yield-dict ergänzt werden:
+            with RUN.stage("scrape") as m: m["pages"] = 12
+        """
+        counters = {}
+        t0 = time.perf_counter()
+        try:
+            yield counters
+        finally:
+            self.add(name, time.perf_counter() - t0, **counters)
+
+    def report(self):
+        with self._lock:
+            items = list(self._stages.items())
+
+        totals = {}
+        for (stage, _, _), st in items:
+            agg = totals.setdefault(stage, StageStats())
+            agg.durations.extend(st.durations)
+            agg.add(**st.counters)
+
+        return {
+            "started_at": self.started_at,
+            "finished_at": utc_now(),
+            "wall_s": round(time.perf_counter() - self._t0, 3),
+            "stages": {stage: st.summary() for stage, st in sorted(totals.items())},
+            "pipelines": [
+                {"stage": stage, "city": city, "category": category, **st.summary()}
+                for (stage, city, category), st in sorted(items)
+            ],
+        }
+
+    def write_json(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2, ensure_ascii=False)
+
+    def to_prometheus(self):
+        """
+        Prometheus Text-Format (z.B. für den node_exporter textfile collector).
+        """
+        report = self.report()
+        lines = [
+            "# TYPE laborsuche_scraper_run_seconds gauge",
+            f"laborsuche_scraper_run_seconds {report['wall_s']}",
+        ]
+        # Samples einer Metrik müssen im Text-Format zusammenhängend stehen
+        families = {}
+        for row in report["pipelines"]:
+            lbl = f'stage="{row["stage"]}",city="{_escape(row["city"])}",category="{row["category"]}"'
+            for key, value in row.items():
+                if key in ("stage", "city", "category") or not isinstance(value, (int, float)):
+                    continue
+                families.setdefault(f"laborsuche_scraper_{key}", []).append(f"{{{lbl}}} {value}")
+        for name, samples in families.items():
+            lines.append(f"# TYPE {name} gauge")
+            lines.extend(name + sample for sample in samples)
+        return "\n".join(lines) + "\n"
+
+    def print_summary(self):
+        print("\n📊 STAGES")
+        print(f"{'STAGE':<12} | {'CALLS':>6} | {'WALL s':>9} | {'p50 s':>7} | {'p95 s':>7} | ZÄHLER")
+        for stage, s in self.report()["stages"].items():
+            extra = ", ".join(
+                f"{k}={v}" for k, v in s.items()
+                if k not in ("calls", "wall_s", "max_s") and not _PERCENTILE_RE.match(k)
+            )
+            print(f"{stage:<12} | {s['calls']:>6} | {s['wall_s']:>9} | {s.get('p50_s', '-'):>7} | {s.get('p95_s', '-'):>7} | {extra}")
+
+_PERCENTILE_RE = re.compile(r"^p\d+_s$")
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+# Prozessweite Metriken des aktuellen Laufs
+RUN = RunMetrics()
+
+def reset():
+    global RUN
+    RUN = RunMetrics()
+    return RUN
@@ -0,0 +1,256 @@
+"""
+Persistenter Seiten-Store für die Scrape-Stage + lokaler Fetch als Alternative zum Cheerio-Actor.
+
+- PageStore: Text pro URL (SQLite) mit Content-Hash, ETag/Last-Modified und TTL.
+  Frische Seiten kommen aus dem Store, nur veraltete/unbekannte URLs werden gescrapt.
+- extract_text: HTML -> Text wie die pageFunction des Cheerio-Actors (scraper.py).
+- fetch_pages: httpx + extract_text, mit If-None-Match / If-Modified-Since für bekannte Seiten.
+"""
+import os
+import re
+import time
+import sqlite3
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+import httpx
+from .utils import content_hash
+from .config import (
+    PAGE_CACHE_ENABLED, PAGE_CACHE_PATH, PAGE_CACHE_TTL_DAYS,
+    LOCAL_FETCH_CONCURRENCY, LOCAL_FETCH_TIMEOUT, MAX_TEXT_PER_PAGE,
+)
+
+# ---------------------------------------------------------------------------
+# HTML -> Text (gleiche Regeln wie die pageFunction)
+# ---------------------------------------------------------------------------
+
+# head zählt bei Cheerio nicht zum body-Text
+_DROP_TAGS = {"script", "style", "nav", "footer", "header", "iframe", "noscript", "head"}
+_DROP_CLASSES = {"cookie-banner", "modal", "popup", "map-placeholder"}
+_DROP_IDS = {"cookie-consent"}
+_MAIN_TAGS = {"main", "article"}
+_VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param",
+    "source", "track", "wbr",
+}
+_MULTI_WS_RE = re.compile(r"\s\s+")
+
+class _TextExtractor(HTMLParser):
+    """
+    Sammelt Text aus body und aus Hauptinhalt (main, #content, .content, article),
+    Müll-Elemente werden samt Inhalt übersprungen.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []  # (tag, drop, main)
+        self.drop_depth = 0
+        self.main_depth = 0
+        self.body = []
+        self.main = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _VOID_TAGS:
+            return
+        attrs = dict(attrs)
+        classes = set((attrs.get("class") or "").split())
+        drop = tag in _DROP_TAGS or bool(classes & _DROP_CLASSES) or attrs.get("id") in _DROP_IDS
+        main = tag in _MAIN_TAGS or attrs.get("id") == "content" or "content" in classes
+        self.stack.append((tag, drop, main))
+        self.drop_depth += drop
+        self.main_depth += main
+
+    def handle_endtag(self, tag):
+        if tag in _VOID_TAGS:
+            return
+        # Nicht geschlossene Elemente (kaputtes HTML) bis zum passenden Start-Tag abbauen
+        for i in range(len(self.stack) - 1, -1, -1):
+            if self.stack[i][0] == tag:
+                for _, drop, main in self.stack[i:]:
+                    self.drop_depth -= drop
+                    self.main_depth -= main
+                del self.stack[i:]
+                return
+
+    def handle_data(self, data):
+        if self.drop_depth:
+            return
+        self.body.append(data)
+        if self.main_depth:
+            self.main.append(data)
+
+def extract_text(html):
+    """
+    Wie die pageFunction: Skripte, Navigation, Footer, Cookie-Banner etc. raus,
+    Hauptinhalt bevorzugt, Fallback auf body bei weniger als 200 Zeichen.
+    Verschachtelte Hauptinhalt-Elemente (main > article) zählen nur einmal.
+    """
+    parser = _TextExtractor()
+    try:
+        parser.feed(html or "")
+        parser.close()
+    except Exception:
+        pass
+    content = "".join(parser.main)
+    if len(content) < 200:
+        content = "".join(parser.body)
+    return _MULTI_WS_RE.sub(" ", content).strip()
+
+# ---------------------------------------------------------------------------
+# Seiten-Store
+# ---------------------------------------------------------------------------
+
+Page = namedtuple("Page", "url text content_hash etag last_modified checked")
+
+class PageStore:
+    """
+    Gescrapter Text pro URL. Eine Seite gilt ttl_days nach der letzten Prüfung als frisch;
+    danach wird sie neu gescrapt (lokal mit ETag/Last-Modified, d.h. oft nur ein 304).
+    """
+
+    def __init__(self, path, ttl_days=PAGE_CACHE_TTL_DAYS):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY, text TEXT NOT NULL, content_hash TEXT NOT NULL,"
+            " etag TEXT, last_modified TEXT, checked REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def get(self, url):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT url, text, content_hash, etag, last_modified, checked FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+        return Page(*row) if row else None
+
+    def is_fresh(self, page, now=None):
+        return page is not None and (now or time.time()) - page.checked <= self.ttl
+
+    def split(self, urls):
+        """
+        -> (frische URLs, veraltete/unbekannte URLs), Reihenfolge bleibt erhalten.
+        """
+        now = time.time()
+        fresh, stale = [], []
+        for url in urls:
+            if self.is_fresh(self.get(url), now):
+                fresh.append(url)
+            else:
+                stale.append(url)
+        with self._lock:
+            self.hits += len(fresh)
+            self.misses += len(stale)
+        return fresh, stale
+
+    def put_many(self, pages):
+        """
+        pages: Iterable von (url, text, etag, last_modified). Schreibt in Batches, gibt die Anzahl zurück.
+        """
+        n = 0
+        now = time.time()
+        batch = []
+        for url, text, etag, last_modified in pages:
+            text = (text or "")[:MAX_TEXT_PER_PAGE]
+            batch.append((url, text, content_hash(text), etag, last_modified, now))
+            if len(batch) >= 200:
+                n += self._write(batch)
+                batch = []
+        return n + self._write(batch)
+
+    def _write(self, rows):
+        if not rows:
+            return 0
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self._db.commit()
+        return len(rows)
+
+    def touch(self, urls):
+        """
+        Seite unverändert (304) -> nur Prüfzeitpunkt erneuern.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.executemany("UPDATE pages SET checked = ? WHERE url = ?", [(now, u) for u in urls])
+            self._db.commit()
+
+    def evict(self):
+        with self._lock:
+            # Doppelte TTL: veraltete Seiten bleiben eine Weile als Basis für bedingte Requests
+            self._db.execute("DELETE FROM pages WHERE checked < ?", (time.time() - 2 * self.ttl,))
+            self._db.commit()
+
+    def close(self):
+        self.evict()
+        with self._lock:
+            self._db.close()
+
+    def stats_line(self):
+        total = self.hits + self.misses
+        rate = (100.0 * self.hits / total) if total else 0.0
+        return f"📄 Seiten-Cache: {self.hits} Hits, {self.misses} Misses ({rate:.0f}% Trefferquote)"
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_page_store():
+    """
+    Prozessweiter Store (None wenn per PAGE_CACHE=0 deaktiviert).
+    """
+    global _store
+    if not PAGE_CACHE_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = PageStore(PAGE_CACHE_PATH)
+        return _store
+
+# ---------------------------------------------------------------------------
+# Lokaler Fetch
+# ---------------------------------------------------------------------------
+
+FetchResult = namedtuple("FetchResult", "url text etag last_modified not_modified")
+
+def _fetch_one(client, url, known):
+    headers = {}
+    if known is not None:
+        if known.etag:
+            headers["If-None-Match"] = known.etag
+        if known.last_modified:
+            headers["If-Modified-Since"] = known.last_modified
+    try:
+        res = client.get(url, headers=headers)
+    except httpx.HTTPError:
+        return None
+    if res.status_code == 304 and known is not None:
+        return FetchResult(url, known.text, known.etag, known.last_modified, True)
+    if res.status_code >= 400 or "html" not in res.headers.get("content-type", "html"):
+        return None
+    return FetchResult(url, extract_text(res.text), res.headers.get("etag"), res.headers.get("last-modified"), False)
+
+def fetch_pages(urls, store=None, concurrency=LOCAL_FETCH_CONCURRENCY, timeout=LOCAL_FETCH_TIMEOUT):
+    """
+    Holt Seiten direkt per HTTP (ohne Apify) und extrahiert den Text.
+    Bekannte Seiten werden bedingt angefragt; nicht erreichbare URLs fehlen im Ergebnis.
+    -> Liste von FetchResult in URL-Reihenfolge.
+    """
+    if not urls:
+        return []
+    known = {url: store.get(url) for url in urls} if store is not None else {}
+    limits = httpx.Limits(max_connections=concurrency)
+    # verify=False wie "ignoreSslErrors" beim Actor
+    with httpx.Client(timeout=timeout, follow_redirects=True, verify=False, limits=limits,
+                      headers={"User-Agent": "Mozilla/5.0 (compatible; laborsuche-dach)"}) as client:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(lambda u: _fetch_one(client, u, known.get(u)), urls))
+    return [r for r in results if r is not None]
@@ -0,0 +1,197 @@
+"""
+Lokaler Vorfilter zwischen Scrape und LLM-Validierung.
+
+Der gescrapte Text pro Kandidat ist bis zu 100k Zeichen groß und besteht größtenteils aus
+Boilerplate. Statt die ersten 25k Zeichen ans LLM zu schicken (und alles dahinter stillschweigend
+zu verlieren), zerlegen wir den Text in Sätze, bewerten kleine Fenster gegen die Begriffe der
+Kategorie und packen nur die besten Passagen in ein Token-Budget.
+"""
+import re
+from collections import namedtuple
+from .config import RELEVANCE_TOKEN_BUDGET, RELEVANCE_WINDOW
+
+# Grobe Schätzung für deutschen Fließtext (kein Tokenizer nötig)
+CHARS_PER_TOKEN = 4
+# Sätze ohne Satzzeichen (Menüs, Tabellen) werden in Stücke dieser Länge geteilt
+MAX_SENTENCE_CHARS = 400
+
+# Positive Begriffe sprechen für das Angebot, negative dagegen – beide sind Evidenz fürs Verdict.
+TERMS = {
+    "dexa": {
+        "positive": [
+            "Körperfett", "Muskelmasse", "Fettanteil", "Fettmasse", "Viszeralfett", "Magermasse",
+            "Weichteilanalyse", "Körperzusammensetzung", "Body Composition", "Body Scan", "DXA", "DEXA",
+        ],
+        "negative": [
+            "Knochendichte", "Osteoporose", "T-Wert", "Lendenwirbelsäule", "Schenkelhals",
+            "Bioimpedanz", "BIA", "InBody", "MRT", "MRI",
+        ],
+    },
+    "blood": {
+        "positive": [
+            "Selbstzahler", "ohne Überweisung", "ohne Rezept", "ohne ärztliche", "ohne Arzt",
+            "Direktlabor", "Direktauftrag", "Patientenauftrag", "Privatpatient", "Preisliste",
+            "Health Check", "Blutabnahme", "Blutuntersuchung", "Blutwerte", "Laborwerte", "IGeL",
+        ],
+        "negative": [
+            "nur mit Überweisung", "Überweisung erforderlich", "Überweisungsschein", "ärztliche Anforderung",
+            "Einsender", "Zuweiser", "Covid", "Corona", "Schnelltest", "PCR",
+        ],
+    },
+}
+
+POSITIVE_WEIGHT = 2.0
+NEGATIVE_WEIGHT = 1.5
+# Nachbarsätze zählen anteilig mit (Kontext: "Wir bieten DXA an. Damit messen wir Körperfett.")
+NEIGHBOR_WEIGHT = 0.5
+
+# Beginnt mit einem Literal, damit die Regex-Engine schnell vorspulen kann; die Leerzeilen
+# davor landen im vorherigen Teil und fallen beim Zerlegen in Sätze weg.
+_SOURCE_RE = re.compile(r"--- SOURCE: (\S+) ---\n")
+# Satzenden (gefolgt von Leerzeichen) trennen zusätzlich zu Zeilenumbrüchen
+_SENTENCE_ENDS = ".!?;"
+
+def _compile(terms):
+    # Wortanfang muss passen; lange Begriffe dürfen Komposita einleiten ("Knochendichtemessung"),
+    # Kürzel nur als ganzes Wort ("BIA" nicht in "Biathlon")
+    alternatives = [
+        re.escape(t) + (r"(?!\w)" if len(t) <= 4 else "")
+        for t in sorted(terms, key=len, reverse=True)
+    ]
+    return re.compile(r"(?<!\w)(?:" + "|".join(alternatives) + ")", re.IGNORECASE)
+
+_PATTERNS = {
+    kind: (_compile(spec["positive"]), _compile(spec["negative"]))
+    for kind, spec in TERMS.items()
+}
+
+Extract = namedtuple("Extract", "text hits positive negative passages")
+
+def split_sources(text):
+    """
+    Zusammengefügter Kandidaten-Text -> [(url|None, text)] (Marker siehe scraper.assign_content).
+    """
+    parts = _SOURCE_RE.split(text)
+    out = [(None, parts[0])] if parts[0].strip() else []
+    out.extend(zip(parts[1::2], parts[2::2]))
+    return out
+
+def split_sentences(text):
+    """
+    Jede Zeile wird einmal normalisiert (wie utils.normalize_text), dann wird an
+    Zeilenumbrüchen und Satzenden geteilt – alles mit str-Methoden statt Regex.
+    """
+    text = "\n".join(" ".join(line.split()) for line in text.split("\n"))
+    for end in _SENTENCE_ENDS:
+        text = text.replace(end + " ", end + "\n")
+    sentences = []
+    for s in text.split("\n"):
+        while len(s) > MAX_SENTENCE_CHARS:
+            cut = s.rfind(" ", 0, MAX_SENTENCE_CHARS)
+            cut = cut if cut > 0 else MAX_SENTENCE_CHARS
+            sentences.append(s[:cut])
+            s = s[cut:].lstrip()
+        if s:
+            sentences.append(s)
+    return sentences
+
+def sentences(text):
+    """
+    -> (Quellen-URLs, [(quellen_index, satz)]). Gleiche Sätze auf mehreren Unterseiten
+    (Navigation, Footer) kommen nur einmal vor.
+    """
+    out = []
+    sources = []
+    seen = set()
+    for url, part in split_sources(text or ""):
+        sources.append(url)
+        for s in split_sentences(part):
+            key = s.lower()
+            if key in seen:
+                continue
+            seen.add(key)
+            out.append((len(sources) - 1, s))
+    return sources, out
+
+def extract(kind, text, token_budget=RELEVANCE_TOKEN_BUDGET, window=RELEVANCE_WINDOW, split=None):
+    """
+    Wählt die relevantesten Passagen aus text für den Validator kind.
+
+    Jeder Satz mit Treffer bildet mit `window` Nachbarsätzen je Seite ein Fenster.
+    Fenster werden nach Score gepackt, bis das Token-Budget erreicht ist, und in
+    Originalreihenfolge (mit SOURCE-Marker) ausgegeben.
+    split: bereits berechnetes sentences(text), spart das erneute Zerlegen.
+    token_budget <= 0 -> Text unverändert.
+    """
+    pos_re, neg_re = _PATTERNS[kind]
+    sources, sents = split if split is not None else sentences(text)
+    sents = list(sents)
+
+    own = []
+    positive = negative = 0
+    for _, s in sents:
+        p = len({m.group(0).lower() for m in pos_re.finditer(s)})
+        n = len({m.group(0).lower() for m in neg_re.finditer(s)})
+        positive += p
+        negative += n
+        own.append(p * POSITIVE_WEIGHT + n * NEGATIVE_WEIGHT)
+
+    hits = positive + negative
+    if token_budget <= 0:
+        return Extract(text, hits, positive, negative, None)
+    if not hits:
+        return Extract("", 0, 0, 0, 0)
+
+    def same_source(i, j):
+        return 0 <= j < len(sents) and sents[i][0] == sents[j][0]
+
+    windows = []
+    for i, score in enumerate(own):
+        if not score:
+            continue
+        lo, hi = i, i
+        context = 0.0
+        for d in range(1, window + 1):
+            if same_source(i, i - d):
+                lo = i - d
+                context += own[lo]
+            if same_source(i, i + d):
+                hi = i + d
+                context += own[hi]
+        windows.append((score + NEIGHBOR_WEIGHT * context, i, lo, hi))
+    windows.sort(key=lambda w: (-w[0], w[1]))
+
+    budget_chars = token_budget * CHARS_PER_TOKEN
+    chosen = set()
+    used = 0
+    passages = 0
+    for _, _, lo, hi in windows:
+        new = [k for k in range(lo, hi + 1) if k not in chosen]
+        cost = sum(len(sents[k][1]) + 1 for k in new)
+        if not new or used + cost > budget_chars:
+            continue
+        chosen.update(new)
+        used += cost
+        passages += 1
+    if not chosen:
+        # Budget kleiner als jedes Fenster: wenigstens der beste Treffersatz
+        best = windows[0][1]
+        sents[best] = (sents[best][0], sents[best][1][:budget_chars])
+        chosen.add(best)
+        passages = 1
+
+    out = []
+    last_source, last_idx = None, None
+    for k in sorted(chosen):
+        source_idx, s = sents[k]
+        if source_idx != last_source:
+            url = sources[source_idx]
+            out.append(f"\n\n--- SOURCE: {url} ---\n" if url else "")
+        elif last_idx is not None and k != last_idx + 1:
+            out.append("\n[…]\n")
+        else:
+            out.append(" ")
+        out.append(s)
+        last_source, last_idx = source_idx, k
+
+    return Extract("".join(out).strip(), hits, positive, negative, passages)
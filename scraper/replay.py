@@ -0,0 +1,328 @@
+"""
+Offline-Betrieb der Pipeline ohne Apify/OpenAI-Credentials.
+
+- record:    echte Clients laufen, Actor-Datasets + LLM-Antworten werden als Fixtures gespeichert
+- replay:    Fake-Clients liefern die gespeicherten Fixtures (optional mit künstlicher Latenz)
+- synthetic: Fake-Clients erzeugen deterministische Testdaten in beliebiger Größe (Benchmarks)
+
+Fixture-Layout:
+    <dir>/actors/<actor>/<hash(run_input)>.json   -> Liste der Dataset-Items
+    <dir>/llm/<hash(model, prompt)>.json           -> {"content": "...", "usage": {...}}
+"""
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import hashlib
+import itertools
+from types import SimpleNamespace
+from . import scraper, validator
+
+def _hash(obj):
+    raw = json.dumps(obj, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:24]
+
+def _actor_dir(actor_id):
+    return actor_id.replace("/", "__")
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+def _completion(content, usage):
+    """
+    Minimaler Nachbau eines ChatCompletion-Objekts (nur was der Validator liest).
+    """
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(**usage) if usage else None,
+    )
+
+def _prompt_of(kwargs):
+    return kwargs["messages"][0]["content"]
+
+# ---------------------------------------------------------------------------
+# Datenquellen
+# ---------------------------------------------------------------------------
+
+class FixtureSource:
+    def __init__(self, fixtures_dir):
+        self.dir = fixtures_dir
+
+    def actor_items(self, actor_id, run_input):
+        path = os.path.join(self.dir, "actors", _actor_dir(actor_id), f"{_hash(run_input)}.json")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Keine Fixture für {actor_id} ({path}) – erst mit --record aufnehmen")
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def llm_response(self, model, prompt):
+        path = os.path.join(self.dir, "llm", f"{_hash([model, prompt])}.json")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Keine LLM-Fixture ({path}) – erst mit --record aufnehmen")
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+_SITE_RE = re.compile(r"site:(\S+)")
+
+_POSITIVE = {
+    "dexa": "Mit der DXA-Messung bestimmen wir Körperfett, Muskelmasse und Viszeralfett präzise.",
+    "blood": "Sie können Ihre Blutwerte als Selbstzahler ohne Überweisung direkt bei uns bestimmen lassen.",
+}
+_NEGATIVE = {
+    "dexa": "Die Knochendichtemessung dient der Früherkennung der Osteoporose.",
+    "blood": "Untersuchungen erfolgen ausschließlich auf Überweisung durch Ihren Arzt.",
+}
+_FILLER = (
+    "Unser Team freut sich auf Ihren Besuch. Termine vereinbaren Sie telefonisch oder online. "
+    "Die Praxis ist barrierefrei erreichbar und liegt zentral. "
+)
+
+class SyntheticSource:
+    """
+    Erzeugt für n Kandidaten Discovery-, Such- und Scrape-Ergebnisse sowie LLM-Verdicts.
+    Deterministisch (seed), damit Benchmarks vergleichbar bleiben.
+
+    shared_every=k: jeder k-te Kandidat ist eine zweite Praxis auf der Domain seines Vorgängers
+    (Website unter /praxis-{i}/, eigene Unterseiten), wie mehrere Anbieter in einem Ärztehaus.
+    Alle gesendeten site:-Queries landen in site_queries.
+    """
+
+    def __init__(self, n_candidates, links_per_domain=3, page_chars=8000, seed=42, shared_every=0):
+        self.n = n_candidates
+        self.links_per_domain = links_per_domain
+        self.page_chars = page_chars
+        self.seed = seed
+        self.shared_every = shared_every
+        self.site_queries = []
+
+    def is_shared(self, i):
+        return self.shared_every > 0 and i % self.shared_every == self.shared_every - 1
+
+    def website(self, i):
+        if self.is_shared(i):
+            return f"https://www.synth-{i - 1}.de/praxis-{i}/"
+        return f"https://www.synth-{i}.de/"
+
+    def actor_items(self, actor_id, run_input):
+        rnd = random.Random(f"{self.seed}:{actor_id}")
+        if actor_id == "compass/crawler-google-places":
+            return [
+                {
+                    "title": f"Synth Praxis {i}",
+                    "website": self.website(i),
+                    "categoryName": rnd.choice(["Radiologe", "Medizinisches Labor", "Arztpraxis"]),
+                    "location": {"lat": 52.3 + rnd.random() * 0.4, "lng": 13.1 + rnd.random() * 0.6},
+                    "address": f"Teststraße {i}, 10115 Berlin",
+                    "phone": f"+49 30 {1000000 + i}",
+                }
+                for i in range(self.n)
+            ]
+        if actor_id == "apify/google-search-scraper":
+            items = []
+            for query in run_input["queries"].split("\n"):
+                m = _SITE_RE.search(query)
+                if not m:
+                    continue
+                domain = m.group(1)
+                self.site_queries.append(domain)
+                prefixes = [""]
+                i = int(domain.split("synth-")[-1].split(".")[0]) if "synth-" in domain else -1
+                if self.is_shared(i + 1) and i + 1 < self.n:
+                    prefixes.append(f"praxis-{i + 1}/")
+                items.append({"organicResults": [
+                    {"url": f"https://{domain}/{prefix}seite-{j}"}
+                    for prefix in prefixes for j in range(self.links_per_domain)
+                ]})
+            return items
+        if actor_id == "apify/cheerio-scraper":
+            items = []
+            for start in run_input["startUrls"]:
+                url = start["url"]
+                rnd_page = random.Random(f"{self.seed}:{url}")
+                kind = rnd_page.choice(["dexa", "blood"])
+                good = rnd_page.random() < 0.4
+                sentence = (_POSITIVE if good else _NEGATIVE)[kind]
+                filler = (_FILLER * (self.page_chars // len(_FILLER) + 1))[: self.page_chars]
+                cut = rnd_page.randrange(len(filler))
+                items.append({"url": url, "text": filler[:cut] + " " + sentence + " " + filler[cut:]})
+            return items
+        return []
+
+    def llm_response(self, model, prompt):
+        verdict = "QUESTIONABLE"
+        quote = None
+        for kind in ("dexa", "blood"):
+            if _POSITIVE[kind] in prompt:
+                verdict, quote = "YES", _POSITIVE[kind]
+                break
+            if _NEGATIVE[kind] in prompt:
+                verdict, quote = "NO", _NEGATIVE[kind]
+        content = json.dumps({"status": verdict, "evidence_quote": quote}, ensure_ascii=False)
+        return {"content": content, "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 30}}
+
+# ---------------------------------------------------------------------------
+# Fake Clients (gleiches Interface wie apify_client / openai, soweit die Pipeline es nutzt)
+# ---------------------------------------------------------------------------
+
+class FakeApifyClient:
+    def __init__(self, source, latency_s=0.0):
+        self.source = source
+        self.latency_s = latency_s
+        self._datasets = {}
+        self._ids = itertools.count(1)
+
+    def actor(self, actor_id):
+        client = self
+
+        class _Actor:
+            def call(self, run_input=None, **_):
+                if client.latency_s:
+                    time.sleep(client.latency_s)
+                dataset_id = f"fake-{next(client._ids)}"
+                client._datasets[dataset_id] = client.source.actor_items(actor_id, run_input)
+                return {"defaultDatasetId": dataset_id, "stats": {"computeUnits": 0.0}, "usageTotalUsd": 0.0}
+
+        return _Actor()
+
+    def dataset(self, dataset_id):
+        items = self._datasets.get(dataset_id, [])
+
+        class _Dataset:
+            def list_items(self, offset=0, limit=None, fields=None, **_):
+                page = items[offset: offset + limit if limit else None]
+                if fields:
+                    page = [{k: v for k, v in item.items() if k in fields} for item in page]
+                return SimpleNamespace(items=page, total=len(items), offset=offset, count=len(page))
+
+            def iterate_items(self, **_):
+                yield from items
+
+        return _Dataset()
+
+class FakeOpenAI:
+    def __init__(self, source, latency_s=0.0):
+        source_, latency = source, latency_s
+
+        class _Completions:
+            def create(self, **kwargs):
+                if latency:
+                    time.sleep(latency)
+                res = source_.llm_response(kwargs.get("model"), _prompt_of(kwargs))
+                return _completion(res["content"], res.get("usage"))
+
+        self.chat = SimpleNamespace(completions=_Completions())
+
+class FakeAsyncOpenAI:
+    def __init__(self, source, latency_s=0.0):
+        source_, latency = source, latency_s
+
+        class _Completions:
+            async def create(self, **kwargs):
+                if latency:
+                    await asyncio.sleep(latency)
+                res = source_.llm_response(kwargs.get("model"), _prompt_of(kwargs))
+                return _completion(res["content"], res.get("usage"))
+
+        self.chat = SimpleNamespace(completions=_Completions())
+
+    async def close(self):
+        pass
+
+# ---------------------------------------------------------------------------
+# Recording-Wrapper um die echten Clients
+# ---------------------------------------------------------------------------
+
+class RecordingApifyClient:
+    def __init__(self, real, fixtures_dir):
+        self.real = real
+        self.dir = fixtures_dir
+
+    def actor(self, actor_id):
+        rec = self
+
+        class _Actor:
+            def call(self, run_input=None, **kwargs):
+                run = rec.real.actor(actor_id).call(run_input=run_input, **kwargs)
+                items = list(rec.real.dataset(run["defaultDatasetId"]).iterate_items())
+                path = os.path.join(rec.dir, "actors", _actor_dir(actor_id), f"{_hash(run_input)}.json")
+                _write_json(path, items)
+                return run
+
+        return _Actor()
+
+    def dataset(self, dataset_id):
+        return self.real.dataset(dataset_id)
+
+def _record_llm(fixtures_dir, kwargs, res):
+    usage = getattr(res, "usage", None)
+    _write_json(
+        os.path.join(fixtures_dir, "llm", f"{_hash([kwargs.get('model'), _prompt_of(kwargs)])}.json"),
+        {
+            "content": res.choices[0].message.content,
+            "usage": {
+                "prompt_tokens": getattr(usage, "prompt_tokens", None),
+                "completion_tokens": getattr(usage, "completion_tokens", None),
+            } if usage else None,
+        },
+    )
+
+class RecordingOpenAI:
+    def __init__(self, real, fixtures_dir):
+        class _Completions:
+            def create(self, **kwargs):
+                res = real.chat.completions.create(**kwargs)
+                _record_llm(fixtures_dir, kwargs, res)
+                return res
+
+        self.chat = SimpleNamespace(completions=_Completions())
+
+class RecordingAsyncOpenAI:
+    def __init__(self, real, fixtures_dir):
+        self.real = real
+
+        class _Completions:
+            async def create(self, **kwargs):
+                res = await real.chat.completions.create(**kwargs)
+                _record_llm(fixtures_dir, kwargs, res)
+                return res
+
+        self.chat = SimpleNamespace(completions=_Completions())
+
+    async def close(self):
+        await self.real.close()
+
+# ---------------------------------------------------------------------------
+
+def install(mode, fixtures_dir=None, actor_latency_s=0.0, llm_latency_s=0.0, source=None, use_cache=False):
+    """
+    Tauscht die Clients in scraper.scraper / scraper.validator aus.
+    mode: "record" | "replay" | "synthetic" (synthetic braucht source=SyntheticSource(...))
+
+    Validierungs- und Seiten-Cache sind standardmäßig aus: beim Aufnehmen würden Cache-Treffer
+    als fehlende Fixtures enden, beim Benchmark die Messung verfälschen.
+    """
+    if not use_cache:
+        validator.get_cache = lambda: None
+        scraper.get_page_store = lambda: None
+
+    if mode == "record":
+        real_async_factory = validator.make_async_client
+        scraper.apify = RecordingApifyClient(scraper.apify, fixtures_dir)
+        validator.client = RecordingOpenAI(validator._get_client(), fixtures_dir)
+        validator.make_async_client = lambda: RecordingAsyncOpenAI(real_async_factory(), fixtures_dir)
+        return
+
+    if mode == "replay":
+        source = FixtureSource(fixtures_dir)
+    elif mode != "synthetic" or source is None:
+        raise ValueError(f"Unbekannter Modus: {mode}")
+
+    scraper.apify = FakeApifyClient(source, actor_latency_s)
+    validator.client = FakeOpenAI(source, llm_latency_s)
+    validator.make_async_client = lambda: FakeAsyncOpenAI(source, llm_latency_s)
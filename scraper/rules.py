@@ -0,0 +1,119 @@
+"""
+Regelbasierte Vorstufe der Validierung: eindeutige Fälle entscheiden wir lokal, ohne LLM.
+
+Eine Regel feuert nur bei hoher Sicherheit (expliziter Satz, keine Verneinung, kein
+Gegenbeleg irgendwo im Text) und liefert den Satz selbst als evidence_quote.
+Alles andere -> None, dann entscheidet das LLM wie bisher.
+"""
+import re
+from collections import namedtuple
+
+def _re(pattern):
+    return re.compile(pattern, re.IGNORECASE)
+
+# Verneinung im selben Satz (außerhalb des eigentlichen Treffers) -> keine Regel-Entscheidung
+_NEGATION = _re(r"(?<!\w)(nicht|kein|keine|keinen|keiner|nur|ausschließlich|leider)(?!\w)")
+
+# --- DEXA -------------------------------------------------------------------
+
+_DXA = _re(
+    r"(?<!\w)(dxa|dexa|dual[- ]?energy[- ]?x[- ]?ray|dual[- ]?röntgen|osteodensitometrie)(?!\w)"
+)
+_BODY_COMPOSITION = _re(
+    r"(?<!\w)(körperfett|fettanteil|fettmasse|fettverteilung|viszeralfett|viszerales fett|muskelmasse|"
+    r"magermasse|fettfreie masse|weichteilanalyse|körperzusammensetzung|body composition|lean mass)"
+)
+_BONE = _re(r"(?<!\w)(knochendichte|osteoporose|t-wert|z-wert|lendenwirbel|schenkelhals|knochenmineral)")
+_OTHER_METHOD = _re(r"(?<!\w)(mrt|mri|ganzkörper-mrt|bia|bioimpedanz|bioelektrische impedanz|inbody|seca|tanita)(?!\w)")
+
+# --- Blut -------------------------------------------------------------------
+
+_NO_REFERRAL = _re(
+    r"(?<!\w)(ohne (ärztliche |vorherige )?(überweisung|überweisungsschein|rezept|verordnung|anforderung)|"
+    r"ohne arzt(besuch)?(?!\w)|direktauftrag|patientenauftrag|"
+    r"(überweisung|verordnung) (ist )?(nicht|keine) (erforderlich|notwendig|nötig))"
+)
+# Nur echte Labor-/Blut-Begriffe; "Untersuchung", "Check-up" o.ä. gibt es auch beim MRT oder Physiotherapeuten
+_LAB_CONTEXT = _re(r"(?<!\w)(blut|labor|vollblut|serum|urinprobe|urinuntersuchung)")
+# Andere Leistungen im selben Satz -> "ohne Überweisung" bezieht sich womöglich nicht aufs Labor
+_NON_LAB = _re(
+    r"(?<!\w)((mrt|mri|ct|ekg|dxa|dexa)(?!\w)|röntgen|kernspin|computertomogra|ultraschall|sonogra|"
+    r"physiotherap|krankengymnastik|massage|ergotherap|osteopath)"
+)
+_REFERRAL_ONLY = _re(
+    r"(?<!\w)((nur|ausschließlich) (mit|auf|nach|per) (einer |ärztlicher |ärztliche[rn]? )?"
+    r"(überweisung|verordnung|anforderung|auftrag (ihres|eines) (arztes|ärztin))|"
+    r"(überweisung|überweisungsschein) (ist )?(zwingend )?(erforderlich|notwendig|nötig|mitbringen)|"
+    r"benötigen (sie )?(eine|einen) (überweisung|überweisungsschein))"
+)
+_SELF_PAY = _re(
+    r"(?<!\w)(selbstzahler|direktlabor|direktauftrag|patientenauftrag|igel|privatleistung|"
+    r"preisliste|health[- ]check|ohne (ärztliche )?(überweisung|rezept|verordnung))"
+)
+_COVID = _re(r"(?<!\w)(covid|corona|sars-cov|schnelltest|pcr|antigen|testzentrum|impf)")
+
+Rule = namedtuple("Rule", "status name evidence")
+
+def _clean(sentence, match):
+    # Verneinungen nur außerhalb des Treffers zählen ("Überweisung nicht erforderlich" ist positiv)
+    return sentence[:match.start()] + " " + sentence[match.end():]
+
+def _first(sents, pattern):
+    for s in sents:
+        if pattern.search(s):
+            return s
+    return None
+
+def classify_dexa(sents):
+    dxa = [s for s in sents if _DXA.search(s)]
+    body = [s for s in sents if _BODY_COMPOSITION.search(s)]
+
+    # YES: ein Satz verknüpft DXA direkt mit Körperzusammensetzung, ohne Verneinung oder anderes Verfahren
+    for s in dxa:
+        m = _BODY_COMPOSITION.search(s)
+        if m and not _OTHER_METHOD.search(s) and not _NEGATION.search(_clean(s, m)):
+            return Rule("YES", "dexa_body_composition", s)
+
+    # NO: DXA nur im Knochendichte-Kontext, Körperzusammensetzung kommt nirgends vor
+    if dxa and not body and all(_BONE.search(s) for s in dxa):
+        return Rule("NO", "dexa_bone_density_only", dxa[0])
+
+    # NO: Körperzusammensetzung nur mit anderem Verfahren (BIA, MRT, ...), DXA nirgends erwähnt
+    if body and not dxa:
+        evidence = _first(body, _OTHER_METHOD)
+        if evidence:
+            return Rule("NO", "dexa_other_method", evidence)
+    return None
+
+def classify_blood(sents):
+    referral_only = [s for s in sents if _REFERRAL_ONLY.search(s)]
+
+    # YES: expliziter Satz "ohne Überweisung" o.ä. im Labor-Kontext, nirgends eine Überweisungspflicht
+    if not referral_only:
+        for s in sents:
+            m = _NO_REFERRAL.search(s)
+            if not m or _COVID.search(s) or _NON_LAB.search(s) or _OTHER_METHOD.search(s):
+                continue
+            rest = _clean(s, m)
+            if _LAB_CONTEXT.search(rest) and not _NEGATION.search(rest):
+                return Rule("YES", "blood_no_referral", s)
+
+    # NO: explizite Überweisungspflicht und kein einziger Hinweis auf Selbstzahler-Angebote
+    if referral_only and not any(_SELF_PAY.search(s) for s in sents):
+        return Rule("NO", "blood_referral_only", referral_only[0])
+    return None
+
+CLASSIFIERS = {
+    "dexa": classify_dexa,
+    "blood": classify_blood,
+}
+
+def classify(kind, sents):
+    """
+    sents: Sätze des Kandidaten-Texts (z.B. aus relevance.sentences).
+    -> Verdict-Dict (wie vom LLM, plus reason) oder None wenn unklar.
+    """
+    rule = CLASSIFIERS[kind](sents)
+    if rule is None:
+        return None
+    return {"status": rule.status, "evidence_quote": rule.evidence, "reason": f"Regel: {rule.name}"}
@@ -1,17 +1,75 @@
+import time
+from urllib.parse import urlparse
 from apify_client import ApifyClient
 from tenacity import retry, stop_after_attempt, wait_exponential
-from .config import APIFY_TOKEN, MAX_CRAWLED_PLACES_PER_SEARCH, MAX_PAGES_PER_QUERY
+from .config import (
+    APIFY_TOKEN, MAX_CRAWLED_PLACES_PER_SEARCH, MAX_PAGES_PER_QUERY,
+    DATASET_PAGE_SIZE, MAX_TEXT_PER_PAGE, MAX_TEXT_PER_CANDIDATE, SCRAPE_BACKEND,
+)
 from .utils import get_domain
+from .domains import DomainIndex
+from .pages import get_page_store, fetch_pages
+from . import limits, metrics, journal
 
 apify = ApifyClient(APIFY_TOKEN)
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
+def _call_actor(actor_id, run_input, stage):
+    """
+    Startet einen Apify Actor und wartet auf das Ende.
+    Läuft über die globalen Apify-Slots, damit parallele Pipelines das Konto nicht fluten.
+    Compute Units / Kosten des Runs landen in den Metriken der Stage.
+    Mit Run-Journal: ein erfolgreicher Run mit gleichem Input wird nicht erneut gestartet,
+    sondern sein Dataset wiederverwendet.
+    """
+    job = journal.current()
+    unit = f"actor:{actor_id}:{journal.digest(run_input)}"
+    dataset_id = job.get(unit) if job is not None else None
+    if dataset_id:
+        metrics.RUN.add(stage, actor_runs_resumed=1)
+        return {"defaultDatasetId": dataset_id}
+
+    with limits.apify_slot():
+        t0 = time.perf_counter()
+        run = apify.actor(actor_id).call(run_input=run_input)
+    if job is not None and run and run.get("status") in (None, "SUCCEEDED"):
+        job.put(unit, run["defaultDatasetId"])
+    stats = (run or {}).get("stats") or {}
+    metrics.RUN.add(
+        stage,
+        actor_runs=1,
+        actor_s=time.perf_counter() - t0,
+        compute_units=stats.get("computeUnits"),
+        usage_usd=(run or {}).get("usageTotalUsd"),
+    )
+    return run
+
+def iter_dataset(dataset_id, fields=None, page_size=DATASET_PAGE_SIZE):
+    """
+    Liest ein Apify Dataset seitenweise (offset/limit) statt alles auf einmal.
+    Es liegt immer nur eine Seite im Speicher; fields begrenzt die übertragenen Felder.
+    """
+    dataset = apify.dataset(dataset_id)
+    offset = 0
+    while True:
+        page = dataset.list_items(offset=offset, limit=page_size, fields=fields)
+        if not page.items:
+            return
+        yield from page.items
+        offset += len(page.items)
+        if page.total is not None and offset >= page.total:
+            return
+
+def _count_retry(retry_state):
+    metrics.RUN.add("discovery", retries=1)
+
+@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10), before_sleep=_count_retry)
 def find_places_discovery(city, queries):
     """
     Schritt 1: Breite Suche via Google Places.
     Holt Basisdaten (Name, URL, Koordinaten) für alle potenziellen Kandidaten.
     """
     print(f"\n🌍 DISCOVERY: Suche in '{city}' nach: {', '.join(queries)}")
+    t0 = time.perf_counter()
 
     run_input = {
         "searchStringsArray": queries,
@@ -21,14 +79,19 @@ def find_places_discovery(city, queries):
     }
 
     # Wir nutzen den compass/crawler-google-places Actor, der ist zuverlässig
-    run = apify.actor("compass/crawler-google-places").call(run_input=run_input)
-    dataset = apify.dataset(run["defaultDatasetId"]).list_items().items
+    run = _call_actor("compass/crawler-google-places", run_input, "discovery")
+    dataset = iter_dataset(
+        run["defaultDatasetId"],
+        fields=["title", "website", "categoryName", "location", "address", "phone"],
+    )
 
     candidates = []
-    seen_domains = set()
+    seen_places = set()
+    raw_items = 0
 
     print(f"\n   📋 Gefundene Kandidaten (Raw):")
     for item in dataset:
+        raw_items += 1
         url = (item.get("website") or "").strip()
         name = item.get("title", "Unbekannt")
         category = item.get("categoryName", "Unbekannt")
@@ -40,9 +103,15 @@ def find_places_discovery(city, queries):
 
         if url and url not in ["", "http://", "https://"]:
             domain = get_domain(url)
-            # Einfache Deduplizierung über die Domain
-            if domain and domain not in seen_domains and len(domain) > 4:
-                seen_domains.add(domain)
+            # Deduplizierung über Domain + Name + Standort: derselbe Ort aus mehreren Suchanfragen fällt raus,
+            # Filialen einer Kette und Praxen im selben Ärztehaus bleiben (Scrape/LLM laufen trotzdem
+            # nur einmal pro Cluster, siehe clusters.py)
+            place = (
+                domain, (name or "").strip().lower(),
+                round(lat, 4) if lat is not None else None, round(lng, 4) if lng is not None else None,
+            )
+            if domain and place not in seen_places and len(domain) > 4:
+                seen_places.add(place)
                 candidates.append({
                     "name": name,
                     "website": url,
@@ -56,6 +125,7 @@ def find_places_discovery(city, queries):
                 print(f"      • {name[:40]:<40} | 📍 {lat},{lng}")
 
     print(f"   -> Eindeutige Kandidaten: {len(candidates)}")
+    metrics.RUN.add("discovery", time.perf_counter() - t0, items=raw_items, candidates=len(candidates))
     return candidates
 
 def sniper_search_and_scrape(candidates, search_keywords, country_code):
@@ -70,22 +140,26 @@ def sniper_search_and_scrape(candidates, search_keywords, country_code):
     print(f"\n🎯 SNIPER: Generiere Suchanfragen für {len(candidates)} Seiten...")
 
     search_queries = []
-    candidate_map = {}
+    candidate_map = {}  # domain -> Kandidaten (mehrere Anbieter können sich eine Website teilen)
     keyword_string = " OR ".join(search_keywords)
 
-    # Bauen der "site:" Queries
+    # Bauen der "site:" Queries, eine pro Domain
     for cand in candidates:
         domain = cand['domain']
         if not domain: continue
-        
-        candidate_map[domain] = cand
+
+        if domain in candidate_map:
+            candidate_map[domain].append(cand)
+            continue
+        candidate_map[domain] = [cand]
         query = f"site:{domain} ({keyword_string})"
         search_queries.append(query)
         # Debug output für den ersten
         if len(search_queries) == 1:
             print(f"      🔎 Beispiel-Query: {query}")
 
-    print(f"   -> Starte {len(search_queries)} Google-Suche(n) via Apify...")
+    # Ein Index für Such-Filter und Text-Zuordnung: Lookup über Domain-Labels statt Schleife über alle Kandidaten
+    domain_index = DomainIndex((domain, cand) for domain, cands in candidate_map.items() for cand in cands)
 
     # Google Search Scraper Konfiguration
     search_input = {
@@ -94,38 +168,111 @@ def sniper_search_and_scrape(candidates, search_keywords, country_code):
         "languageCode": "de",
         "maxPagesPerQuery": MAX_PAGES_PER_QUERY,
     }
+    urls_to_scrape = journal.checkpoint(
+        f"search:{journal.digest(search_input)}",
+        lambda: _search_deep_links(search_input, len(search_queries), domain_index),
+    )
+    print(f"   -> Scrape jetzt {len(urls_to_scrape)} spezifische Unterseiten...")
 
-    search_run = apify.actor("apify/google-search-scraper").call(run_input=search_input)
-    search_results = apify.dataset(search_run["defaultDatasetId"]).list_items().items
+    if not urls_to_scrape:
+        return {}
+
+    # Seiten-Cache: frische Seiten nicht erneut scrapen
+    urls = [u["url"] for u in urls_to_scrape]
+    store = get_page_store()
+    fresh, stale = store.split(urls) if store is not None else ([], urls)
+    metrics.RUN.add("page_cache", hits=len(fresh), misses=len(stale))
+    if fresh:
+        print(f"   -> {len(fresh)} Seite(n) aus dem Cache, {len(stale)} neu zu scrapen")
+
+    t0 = time.perf_counter()
+    scraped_pages = _counted(_scrape(stale, store), "scrape")
+    if store is None:
+        pages = scraped_pages
+    else:
+        # Erst alles in den Store, dann in Such-Reihenfolge wieder lesen (immer nur eine Seite im Speicher).
+        # Fehlgeschlagene Seiten behalten ihren alten Text, falls vorhanden.
+        store.put_many((url, text, None, None) for url, text in scraped_pages)
+        pages = _stored_pages(store, urls)
+    content_map = assign_content(pages, domain_index)
+    metrics.RUN.add("scrape", time.perf_counter() - t0, candidates_with_text=len(content_map))
+    return content_map
+
+def _search_deep_links(search_input, n_queries, domain_index):
+    """
+    Google-Suche über den Actor, gefiltert auf URLs, die zu einem Kandidaten gehören.
+    """
+    print(f"   -> Starte {n_queries} Google-Suche(n) via Apify...")
+    t0 = time.perf_counter()
+
+    search_run = _call_actor("apify/google-search-scraper", search_input, "search")
+    search_results = iter_dataset(search_run["defaultDatasetId"], fields=["organicResults"])
 
     urls_to_scrape = []
+    seen_urls = set()
+    n_results = 0
 
     # Filterung: Wir nehmen nur URLs, die wirklich zur Domain des Kandidaten gehören
     print(f"\n   🔗 Relevante Deep-Links gefunden:")
     for item in search_results:
         for res in item.get("organicResults", []):
+            n_results += 1
             url = res.get("url")
-            if url:
-                domain = get_domain(url)
-                # Check, ob die gefundene URL zu einem unserer Kandidaten gehört
-                for cand_domain in candidate_map:
-                    if cand_domain in domain or domain in cand_domain:
-                        urls_to_scrape.append({"url": url})
-                        # Nur den ersten Treffer pro Domain loggen, sonst spammt es die Konsole voll
-                        break
+            # Check, ob die gefundene URL zu einem unserer Kandidaten gehört
+            if url and url not in seen_urls and get_domain(url) in domain_index:
+                seen_urls.add(url)
+                urls_to_scrape.append({"url": url})
 
-    print(f"   -> Scrape jetzt {len(urls_to_scrape)} spezifische Unterseiten...")
+    metrics.RUN.add("search", time.perf_counter() - t0, queries=n_queries, items=n_results, urls=len(urls_to_scrape))
+    return urls_to_scrape
 
-    if not urls_to_scrape:
-        return {}
+def _stored_pages(store, urls):
+    for url in urls:
+        page = store.get(url)
+        if page is not None:
+            yield url, page.text
+
+def _scrape(urls, store):
+    """
+    (url, text) für die URLs: über den Cheerio-Actor oder lokal (SCRAPE_BACKEND=local).
+    Schlägt der Actor fehl, holen wir die Seiten lokal.
+    """
+    if not urls:
+        return
+    if SCRAPE_BACKEND == "local":
+        yield from _scrape_local(urls, store)
+        return
+    try:
+        run = _call_actor("apify/cheerio-scraper", _cheerio_input(urls), "scrape")
+    except Exception as e:
+        print(f"   ⚠️ Cheerio-Actor fehlgeschlagen ({e}), hole {len(urls)} Seite(n) lokal")
+        metrics.RUN.add("scrape", local_fallbacks=1)
+        yield from _scrape_local(urls, store)
+        return
+    for item in iter_dataset(run["defaultDatasetId"], fields=["url", "text"]):
+        yield item.get("url"), item.get("text") or ""
 
+def _scrape_local(urls, store):
+    results = fetch_pages(urls, store)
+    unchanged = [r.url for r in results if r.not_modified]
+    if store is not None:
+        # ETag/Last-Modified gleich mitschreiben, 304 erneuert nur den Prüfzeitpunkt
+        store.touch(unchanged)
+        store.put_many((r.url, r.text, r.etag, r.last_modified) for r in results if not r.not_modified)
+    metrics.RUN.add("scrape", local_pages=len(results), not_modified=len(unchanged))
+    for r in results:
+        if not r.not_modified or store is None:
+            yield r.url, r.text
+
+def _cheerio_input(urls):
     # Cheerio Scraper: Schnell und günstig für reinen Text
-    scrape_input = {
-        "startUrls": urls_to_scrape,
+    return {
+        "startUrls": [{"url": url} for url in urls],
         "maxRequestRetries": 1,
         "proxyConfiguration": {"useApifyProxy": True},
         "ignoreSslErrors": True,
-        # Wir entfernen direkt alles, was kein Content ist (Navi, Footer, Cookie-Banner)
+        # Wir entfernen direkt alles, was kein Content ist (Navi, Footer, Cookie-Banner).
+        # Lokales Gegenstück: pages.extract_text
         "pageFunction": """
             async function pageFunction(context) {
                 const { $ } = context;
@@ -150,25 +297,56 @@ def sniper_search_and_scrape(candidates, search_keywords, country_code):
         """
     }
 
-    scrape_run = apify.actor("apify/cheerio-scraper").call(run_input=scrape_input)
-    scraped_items = apify.dataset(scrape_run["defaultDatasetId"]).list_items().items
+def _counted(pages, stage):
+    """
+    Zählt Seiten + Textmenge (Bytes), während sie durchgereicht werden.
+    """
+    n, size = 0, 0
+    for url, text in pages:
+        n += 1
+        size += len(text.encode("utf-8"))
+        yield url, text
+    metrics.RUN.add(stage, items=n, text_bytes=size)
 
-    # Text den Kandidaten zuordnen
-    content_map = {}
-    for item in scraped_items:
-        url = item.get("url")
+def assign_content(pages, domain_index):
+    """
+    Ordnet gescrapte Seiten (url, text) den Kandidaten zu, während sie hereinkommen.
+    Pro Seite max. MAX_TEXT_PER_PAGE Zeichen, pro Kandidat max. MAX_TEXT_PER_CANDIDATE,
+    damit der Speicher auch bei vielen Deep-Links pro Domain begrenzt bleibt.
+    Ergebnis: {website: zusammengefügter Text}
+    """
+    chunks = {}
+    sizes = {}
+    for url, text in pages:
         if not url: continue
-        
-        text = item.get("text", "") or ""
-        domain = get_domain(url)
-        
-        for cand_domain, info in candidate_map.items():
-            if cand_domain in domain or domain in cand_domain:
-                main_url = info['website']
-                if main_url not in content_map:
-                    content_map[main_url] = ""
-                # Wir hängen den Text an, falls wir mehrere Unterseiten pro Domain haben
-                content_map[main_url] += f"\n\n--- SOURCE: {url} ---\n{text[:25000]}"
-                break
-
-    return content_map
\ No newline at end of file
+
+        infos = domain_index.match(get_domain(url))
+        if infos is None: continue
+
+        for main_url in _page_owners(url, infos):
+            used = sizes.get(main_url, 0)
+            if used >= MAX_TEXT_PER_CANDIDATE: continue
+
+            # Wir hängen den Text an, falls wir mehrere Unterseiten pro Domain haben
+            chunk = f"\n\n--- SOURCE: {url} ---\n{text[:MAX_TEXT_PER_PAGE]}"[:MAX_TEXT_PER_CANDIDATE - used]
+            chunks.setdefault(main_url, []).append(chunk)
+            sizes[main_url] = used + len(chunk)
+
+    return {main_url: "".join(parts) for main_url, parts in chunks.items()}
+
+def _page_owners(url, infos):
+    """
+    Websites der Kandidaten, denen eine Seite gehört. Teilen sich mehrere Kandidaten eine Domain,
+    bekommt eine Seite unterhalb des Website-Pfads eines Kandidaten ("/praxis-mueller/...") nur
+    dieser, alle anderen Seiten (Startseite, Impressum, ...) gehen an alle.
+    """
+    websites = list(dict.fromkeys(info['website'] for info in infos))
+    if len(websites) == 1:
+        return websites
+    path = urlparse(url).path.rstrip("/") + "/"
+    own = [w for w in websites if _site_path(w) and path.startswith(_site_path(w))]
+    return own or websites
+
+def _site_path(website):
+    path = urlparse(website if "//" in website else "http://" + website).path.rstrip("/")
+    return path + "/" if path else ""
@@ -0,0 +1,268 @@
+"""
+Versionierte, unveränderliche Daten-Snapshots für das Backend.
+
+Ein Lauf schreibt nie in die Dateien, die das Backend gerade liest:
+
+    data/CURRENT.json                  -> {"version": ..., "dir": "snapshots/<version>", "previous": ...}
+    data/snapshots/<version>/          -> *_VALID.json, *_REJECTED.csv, providers.sqlite (nach Publish unveränderlich)
+    data/snapshots/.staging-<run-id>/  -> Arbeitsverzeichnis des laufenden Batches
+
+publish(): vom Lauf nicht angefasste Datensätze (VALID + REJECTED) per Hardlink aus dem aktuellen
+Snapshot übernehmen, alles fsyncen, Staging-Ordner in snapshots/<version> umbenennen und
+CURRENT.json atomar ersetzen.
+Alte Versionen bleiben liegen (SNAPSHOT_KEEP) -> Rollback = Manifest zurücksetzen.
+
+    python -m scraper.snapshots list
+    python -m scraper.snapshots rollback [<version>]    # ohne Version: die vorherige
+"""
+import os
+import re
+import sys
+import json
+import shutil
+import argparse
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from .config import DATA_DIR, SNAPSHOT_KEEP
+from .storage import SQLITE_FILENAME, rebuild_from_json, write_compact
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+MANIFEST = "CURRENT.json"
+SNAPSHOTS = "snapshots"
+STAGING_PREFIX = ".staging-"
+LOCK = ".publish.lock"
+
+# Dateien, die zu einem Datenstand gehören (alles andere in data/ bleibt außen vor)
+_DATASET_RE = re.compile(r"^(?P<city>.+)_(?P<kind>BLOOD|DEXA)_(VALID\.json|REJECTED\.csv)$", re.IGNORECASE)
+
+def _dataset(name):
+    """
+    Dateiname -> (stadt, kategorie) oder None. VALID und REJECTED eines Datensatzes gehören zusammen.
+    """
+    m = _DATASET_RE.match(name)
+    return (m.group("city"), m.group("kind").upper()) if m else None
+
+def _fsync_file(path):
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+def _fsync_dir(path):
+    # Verzeichnis-Einträge (Rename, neue Dateien) dauerhaft machen; nicht überall möglich (Windows)
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def read_manifest(data_dir=DATA_DIR):
+    try:
+        with open(os.path.join(data_dir, MANIFEST), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def current_dir(data_dir=DATA_DIR):
+    """
+    Verzeichnis des veröffentlichten Datenstands; ohne Manifest (Altbestand) data/ selbst.
+    """
+    manifest = read_manifest(data_dir)
+    return os.path.join(data_dir, manifest["dir"]) if manifest else data_dir
+
+def _write_manifest(data_dir, manifest):
+    path = os.path.join(data_dir, MANIFEST)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    _fsync_dir(data_dir)
+
+@contextmanager
+def _locked(data_dir):
+    """
+    Exklusiver Zugriff auf CURRENT.json über Prozesse hinweg (Publish, Rollback).
+    Die Sperre hängt am offenen Dateihandle und verschwindet auch bei einem Absturz.
+    """
+    with open(os.path.join(data_dir, LOCK), "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def list_versions(data_dir=DATA_DIR):
+    root = os.path.join(data_dir, SNAPSHOTS)
+    if not os.path.isdir(root):
+        return []
+    return sorted(v for v in os.listdir(root) if not v.startswith("."))
+
+def _seed_sqlite(base, target):
+    # SQLite wird pro Job geändert -> echte Kopie statt Hardlink auf die veröffentlichte Datei
+    base_sqlite = os.path.join(base, SQLITE_FILENAME)
+    if os.path.exists(base_sqlite):
+        shutil.copy2(base_sqlite, os.path.join(target, SQLITE_FILENAME))
+    elif os.path.isdir(base) and any(n.upper().endswith("_VALID.JSON") for n in os.listdir(base)):
+        # Altbestand ohne providers.sqlite: aus den JSON-Dateien aufbauen
+        rebuild_from_json(base, out_dir=target)
+
+class Staging:
+    """
+    Arbeitsverzeichnis eines Batches. Alle Jobs schreiben hierhin (save_results), das Backend
+    sieht davon nichts, bis publish() den Stand als neue Version freigibt.
+    Mit gleicher Run-ID (--resume) wird ein vorhandenes Staging weiterverwendet.
+    """
+
+    def __init__(self, run_id, data_dir=DATA_DIR):
+        self.data_dir = data_dir
+        self.run_id = run_id
+        self.dir = os.path.join(data_dir, SNAPSHOTS, STAGING_PREFIX + run_id)
+        self.base = current_dir(data_dir)
+        if not os.path.isdir(self.dir):
+            tmp = self.dir + ".tmp"
+            shutil.rmtree(tmp, ignore_errors=True)
+            os.makedirs(tmp)
+            _seed_sqlite(self.base, tmp)
+            os.replace(tmp, self.dir)
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def publish(self, keep=SNAPSHOT_KEEP):
+        """
+        Macht den Staging-Stand zur aktuellen Version. -> Versions-ID.
+        Basis ist der Stand beim Publish, nicht beim Start: hat ein parallel laufender Batch
+        inzwischen veröffentlicht, bleiben dessen Datensätze erhalten.
+        """
+        with _locked(self.data_dir):
+            base = current_dir(self.data_dir)
+            if os.path.realpath(base) != os.path.realpath(self.base):
+                self._rebase(base)
+            return self._publish(keep)
+
+    def _rebase(self, base):
+        """
+        Neue Basis: SQLite aus ihr neu kopieren und die Datensätze dieses Laufs erneut einspielen.
+        """
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            path = self.path(SQLITE_FILENAME + suffix)
+            if os.path.exists(path):
+                os.remove(path)
+        _seed_sqlite(base, self.dir)
+        for name in sorted(os.listdir(self.dir)):
+            key = _dataset(name)
+            if key is None or not name.lower().endswith("_valid.json"):
+                continue
+            with open(self.path(name), "r", encoding="utf-8") as f:
+                write_compact(key[0], key[1], json.load(f), data_dir=self.dir)
+        self.base = base
+
+    def _publish(self, keep):
+        # Nur Datensätze übernehmen, die der Lauf gar nicht angefasst hat – immer VALID und REJECTED
+        # zusammen, sonst bliebe z.B. eine alte REJECTED.csv neben einer neuen VALID.json liegen
+        touched = {_dataset(n) for n in os.listdir(self.dir)} - {None}
+        for name in os.listdir(self.base):
+            key = _dataset(name)
+            if key is None or key in touched:
+                continue
+            src, dst = os.path.join(self.base, name), os.path.join(self.dir, name)
+            try:
+                os.link(src, dst)
+            except OSError:
+                shutil.copy2(src, dst)
+
+        for name in os.listdir(self.dir):
+            if name.endswith(("-wal", "-shm", "-journal")):
+                continue
+            _fsync_file(os.path.join(self.dir, name))
+        _fsync_dir(self.dir)
+
+        version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        target = os.path.join(self.data_dir, SNAPSHOTS, version)
+        os.replace(self.dir, target)
+        _fsync_dir(os.path.dirname(target))
+
+        previous = read_manifest(self.data_dir)
+        _write_manifest(self.data_dir, {
+            "version": version,
+            "dir": f"{SNAPSHOTS}/{version}",
+            "published_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "run_id": self.run_id,
+            "previous": previous["version"] if previous else None,
+        })
+        prune(self.data_dir, keep)
+        return version
+
+    def discard(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+def prune(data_dir=DATA_DIR, keep=SNAPSHOT_KEEP):
+    """
+    Löscht die ältesten Versionen, behält die neuesten `keep` plus die aktuelle und deren Vorgänger.
+    """
+    manifest = read_manifest(data_dir) or {}
+    protected = {manifest.get("version"), manifest.get("previous")}
+    versions = list_versions(data_dir)
+    for version in versions[:max(0, len(versions) - keep)]:
+        if version not in protected:
+            shutil.rmtree(os.path.join(data_dir, SNAPSHOTS, version), ignore_errors=True)
+
+def rollback(version=None, data_dir=DATA_DIR):
+    """
+    Setzt CURRENT.json auf eine ältere Version (Standard: die vorherige). -> Versions-ID.
+    """
+    with _locked(data_dir):
+        manifest = read_manifest(data_dir)
+        if manifest is None:
+            raise ValueError("Kein veröffentlichter Snapshot vorhanden")
+        version = version or manifest.get("previous")
+        if not version or version not in list_versions(data_dir):
+            raise ValueError(f"Unbekannte Version: {version}")
+        _write_manifest(data_dir, {
+            "version": version,
+            "dir": f"{SNAPSHOTS}/{version}",
+            "published_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "run_id": None,
+            "previous": manifest["version"],
+        })
+    return version
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(description="Daten-Snapshots verwalten")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="Vorhandene Versionen anzeigen")
+    rb = sub.add_parser("rollback", help="CURRENT.json auf eine ältere Version setzen")
+    rb.add_argument("version", nargs="?", help="Standard: die vorherige Version")
+    args = parser.parse_args(argv)
+
+    if args.command == "list":
+        current = (read_manifest() or {}).get("version")
+        for version in list_versions():
+            print(f"{'*' if version == current else ' '} {version}")
+        return
+    try:
+        print(f"⏪ Aktuelle Version: {rollback(args.version)}")
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+if __name__ == "__main__":
+    cli()
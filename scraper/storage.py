@@ -0,0 +1,89 @@
+import os
+import re
+import json
+import sqlite3
+import threading
+from .config import DATA_DIR
+
+# Konsolidierter Provider-Store fürs Backend (zusätzlich zu den JSON-Dateien).
+# Schema muss zu backend/app/storage.py passen (SQLITE_SCHEMA_VERSION, HOT_FIELDS).
+SQLITE_FILENAME = "providers.sqlite"
+SCHEMA_VERSION = 1
+
+HOT_FIELDS = ("name", "website", "google_category", "domain", "address", "phone", "lat", "lng", "status")
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS providers (
+    id INTEGER PRIMARY KEY,
+    city TEXT NOT NULL,
+    category TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    {", ".join(f"{f} {'REAL' if f in ('lat', 'lng') else 'TEXT'}" for f in HOT_FIELDS)},
+    evidence_quote TEXT,
+    extra TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_providers_dataset ON providers(city, category, status);
+"""
+
+_VALID_RE = re.compile(r"^(?P<city>.+)_(?P<kind>BLOOD|DEXA)_VALID\.json$", re.IGNORECASE)
+
+# Mehrere Pipeline-Threads schreiben in dieselbe Datei
+_write_lock = threading.Lock()
+
+def _connect(path):
+    con = sqlite3.connect(path, timeout=30)
+    con.executescript(_SCHEMA)
+    con.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    return con
+
+def _row(city, category, position, record):
+    extra = {k: v for k, v in record.items() if k not in HOT_FIELDS and k not in ("evidence_quote", "city", "category")}
+    return (
+        city, category, position,
+        *(record.get(f) for f in HOT_FIELDS),
+        record.get("evidence_quote"),
+        json.dumps(extra, ensure_ascii=False) if extra else None,
+    )
+
+def write_compact(city, category, records, data_dir=DATA_DIR):
+    """
+    Ersetzt den Datensatz Stadt×Kategorie im konsolidierten SQLite-Store (eine Transaktion).
+    Das Backend lädt daraus nur die Felder für Karte/Liste, Evidence Quotes erst bei Bedarf.
+    """
+    category = category.lower()
+    path = os.path.join(data_dir, SQLITE_FILENAME)
+    cols = ", ".join(("city", "category", "position") + HOT_FIELDS + ("evidence_quote", "extra"))
+    marks = ", ".join("?" * (len(HOT_FIELDS) + 5))
+
+    with _write_lock:
+        con = _connect(path)
+        try:
+            with con:
+                con.execute("DELETE FROM providers WHERE city = ? AND category = ?", (city, category))
+                con.executemany(
+                    f"INSERT INTO providers ({cols}) VALUES ({marks})",
+                    [_row(city, category, i, r) for i, r in enumerate(records)],
+                )
+        finally:
+            con.close()
+
+def rebuild_from_json(data_dir=DATA_DIR, out_dir=None):
+    """
+    Baut providers.sqlite aus allen vorhandenen *_VALID.json neu auf (z.B. für Altdaten).
+    out_dir: Zielordner der SQLite-Datei, Standard wie data_dir.
+    """
+    out_dir = out_dir or data_dir
+    n = 0
+    for name in sorted(os.listdir(data_dir)):
+        m = _VALID_RE.match(name)
+        if not m:
+            continue
+        with open(os.path.join(data_dir, name), "r", encoding="utf-8") as f:
+            records = json.load(f)
+        write_compact(m.group("city"), m.group("kind"), records, data_dir=out_dir)
+        print(f"   • {name}: {len(records)} Einträge")
+        n += 1
+    print(f"📦 {n} Datensätze in {os.path.join(out_dir, SQLITE_FILENAME)}")
+
+if __name__ == "__main__":
+    rebuild_from_json()
@@ -1,3 +1,5 @@
+import hashlib
+from datetime import datetime, timezone
 from urllib.parse import urlparse
 
 def get_domain(url):
@@ -14,4 +16,22 @@ def get_domain(url):
         # www. wegwerfen, stört nur beim Vergleich
         return urlparse(url).netloc.replace("www.", "").strip().lower()
     except:
-        return ""
\ No newline at end of file
+        return ""
+
+def normalize_text(text):
+    """
+    Whitespace-Unterschiede (Zeilenumbrüche, Mehrfach-Leerzeichen) sollen keinen Unterschied machen.
+    """
+    return " ".join((text or "").split())
+
+def content_hash(text):
+    """
+    Stabiler Hash über den gescrapten Text eines Kandidaten (leer -> "").
+    """
+    text = normalize_text(text)
+    if not text:
+        return ""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def utc_now():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
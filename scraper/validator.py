@@ -1,18 +1,30 @@
 import json
-from openai import OpenAI
-from .config import OPENAI_API_KEY
+import time
+import random
+import asyncio
+import openai
+from openai import OpenAI, AsyncOpenAI
+from .config import (
+    OPENAI_API_KEY, OPENAI_BASE_URL, OPENAI_MODEL, MAX_CONCURRENT_OPENAI_CALLS, MAX_AI_RETRIES,
+    RELEVANCE_SKIP_WITHOUT_HITS, RULES_ENABLED,
+)
+from . import limits, metrics, relevance, rules
+from .cache import get_cache, cache_key
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Lazy, damit der Import auch ohne API-Key klappt (Offline-Replay, Benchmarks)
+client = None
 
-def validate_dexa(text, name):
-    """
-    Prüft via LLM, ob es sich wirklich um Body Composition handelt 
-    oder nur um Knochendichte (Osteoporose).
-    """
-    if not text:
-        return {"status": "QUESTIONABLE", "reason": "Kein Text gescrapt", "evidence_quote": None}
+def _get_client():
+    global client
+    if client is None:
+        client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL)
+    return client
+
+NO_TEXT_RESULT = {"status": "QUESTIONABLE", "reason": "Kein Text gescrapt", "evidence_quote": None}
+NO_HITS_RESULT = {"status": "QUESTIONABLE", "reason": "Keine relevanten Textstellen", "evidence_quote": None}
 
-    prompt = f"""You are a strict compliance auditor for a healthcare provider directory.
+def build_dexa_prompt(text, name):
+    return f"""You are a strict compliance auditor for a healthcare provider directory.
 
 Goal:
 Decide if provider "{name}" offers a **DXA/DEXA Body Composition** scan (fat %, muscle mass, lean mass, visceral fat) as a patient service.
@@ -31,16 +43,8 @@ Text Snippets:
 
 Response JSON: {{"status":"YES"|"NO"|"QUESTIONABLE", "evidence_quote": "..."}}"""
 
-    return _call_openai(prompt)
-
-def validate_blood(text, name):
-    """
-    Prüft, ob Blutabnahme ohne ärztliche Überweisung (Selbstzahler) möglich ist.
-    """
-    if not text:
-        return {"status": "QUESTIONABLE", "reason": "Kein Text gescrapt", "evidence_quote": None}
-
-    prompt = f"""
+def build_blood_prompt(text, name):
+    return f"""
 Du bist ein strenger Auditor für DACH-Gesundheitsanbieter. Du darfst NICHT raten.
 
 AUFGABE
@@ -70,15 +74,305 @@ Text Snippets:
 
 Response JSON: {{"status":"YES"|"NO"|"QUESTIONABLE", "evidence_quote": "..."}}"""
 
-    return _call_openai(prompt)
+def validate_dexa(text, name):
+    """
+    Prüft via LLM, ob es sich wirklich um Body Composition handelt 
+    oder nur um Knochendichte (Osteoporose).
+    """
+    return _validate("dexa", text, name)
+
+def validate_blood(text, name):
+    """
+    Prüft, ob Blutabnahme ohne ärztliche Überweisung (Selbstzahler) möglich ist.
+    """
+    return _validate("blood", text, name)
+
+PROMPT_BUILDERS = {
+    "dexa": build_dexa_prompt,
+    "blood": build_blood_prompt,
+}
+
+def _cache_lookup(kind, text, name):
+    """
+    -> (cache, key, verdict|None). Der Key hängt an Modell, Validator, Anbieter und normalisiertem Text.
+    """
+    cache = get_cache()
+    if cache is None:
+        return None, None, None
+    key = cache_key(OPENAI_MODEL, kind, name, text)
+    cached = cache.get(key)
+    metrics.RUN.add("llm_cache", hits=int(cached is not None), misses=int(cached is None))
+    return cache, key, cached
+
+def _prepare(kind, text):
+    """
+    -> (Text fürs Prompt, lokales Verdict|None, Stufe).
+    Stufen: "no_text", "rules" (eindeutiger Fall, rules.py), "no_hits" (kein relevanter Begriff),
+    None = ans LLM, und zwar nur die relevanten Passagen (relevance.py).
+    """
+    if not text:
+        return None, dict(NO_TEXT_RESULT), "no_text"
+
+    split = relevance.sentences(text)
+    if RULES_ENABLED:
+        t0 = time.perf_counter()
+        verdict = rules.classify(kind, [s for _, s in split[1]])
+        metrics.RUN.add(
+            "rules",
+            time.perf_counter() - t0,
+            checked=1,
+            resolved=int(verdict is not None),
+            yes=int(verdict is not None and verdict["status"] == "YES"),
+            no=int(verdict is not None and verdict["status"] == "NO"),
+        )
+        if verdict is not None:
+            return None, verdict, "rules"
+
+    t0 = time.perf_counter()
+    ex = relevance.extract(kind, text, split=split)
+    no_hits = not ex.hits and RELEVANCE_SKIP_WITHOUT_HITS
+    metrics.RUN.add(
+        "relevance",
+        time.perf_counter() - t0,
+        chars_in=len(text),
+        chars_out=0 if no_hits else len(ex.text),
+        passages=ex.passages,
+        no_hits=int(no_hits),
+    )
+    if no_hits:
+        return None, dict(NO_HITS_RESULT), "no_hits"
+    return ex.text or text, None, None
+
+def _validate(kind, text, name):
+    text, local, _ = _prepare(kind, text)
+    if local is not None:
+        return local
+
+    cache, key, cached = _cache_lookup(kind, text, name)
+    if cached is not None:
+        return cached
+
+    res = _call_openai(PROMPT_BUILDERS[kind](text, name))
+    if cache is not None:
+        cache.put(key, res)
+    return res
+
+def _ai_error(e):
+    return {"status": "QUESTIONABLE", "reason": f"AI Error: {str(e)}", "evidence_quote": None}
+
+def _record_llm(t0, prompt, res=None, error=False):
+    """
+    Ein LLM-Request in den Metriken: Latenz, Prompt-Größe, Tokens (falls vom API geliefert).
+    """
+    usage = getattr(res, "usage", None)
+    metrics.RUN.add(
+        "llm",
+        time.perf_counter() - t0,
+        requests=1,
+        prompt_chars=len(prompt),
+        prompt_tokens=getattr(usage, "prompt_tokens", None),
+        completion_tokens=getattr(usage, "completion_tokens", None),
+        failed_requests=int(error),
+    )
 
 def _call_openai(prompt):
     try:
-        res = client.chat.completions.create(
-            model="gpt-4-turbo", 
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"}
-        )
+        with limits.openai_slot():
+            t0 = time.perf_counter()
+            try:
+                res = _get_client().chat.completions.create(
+                    model=OPENAI_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    response_format={"type": "json_object"}
+                )
+            except Exception:
+                _record_llm(t0, prompt, error=True)
+                raise
+            _record_llm(t0, prompt, res)
         return json.loads(res.choices[0].message.content)
     except Exception as e:
-        return {"status": "QUESTIONABLE", "reason": f"AI Error: {str(e)}", "evidence_quote": None}
\ No newline at end of file
+        return _ai_error(e)
+
+# ---------------------------------------------------------------------------
+# Async Batch-Validierung
+# ---------------------------------------------------------------------------
+
+def make_async_client():
+    # Retries machen wir selbst (Retry-After + adaptives Limit), nicht der SDK-Client.
+    # Wird von replay.install() durch einen Offline-Fake ersetzt.
+    return AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL, max_retries=0)
+
+def _retry_after(e):
+    """
+    Wartezeit in Sekunden aus einem 429/503 (retry-after-ms bzw. retry-after Header), sonst None.
+    """
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(header)
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value) * scale)
+        except ValueError:
+            continue
+    return None
+
+def _is_retryable(e):
+    if isinstance(e, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    return isinstance(e, openai.APIStatusError) and e.status_code >= 500
+
+class AdaptiveLimiter:
+    """
+    Begrenzt gleichzeitige Requests und passt das Limit an (AIMD):
+    - 429 -> Limit halbieren + alle Worker pausieren bis Retry-After abgelaufen ist
+    - Erfolg -> Limit langsam wieder erhöhen (bis max_limit)
+    Zusätzlich wird der prozessweite openai-Slot gehalten (siehe limits.py),
+    damit parallele Pipelines zusammen das globale Limit nicht überschreiten.
+    """
+
+    def __init__(self, max_limit):
+        self.max_limit = max(1, max_limit)
+        self.limit = self.max_limit
+        self.in_flight = 0
+        self.pause_until = 0.0
+        self._successes = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            while True:
+                wait = self.pause_until - time.monotonic()
+                if wait > 0:
+                    try:
+                        await asyncio.wait_for(self._cond.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if self.in_flight < self.limit:
+                    break
+                await self._cond.wait()
+            self.in_flight += 1
+
+        # Globaler Slot (threading-Semaphore) ohne den Event-Loop zu blockieren
+        while not limits.openai_slots.acquire(blocking=False):
+            await asyncio.sleep(0.05)
+
+    async def release(self):
+        limits.openai_slots.release()
+        async with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    async def on_success(self):
+        async with self._cond:
+            self._successes += 1
+            if self.limit < self.max_limit and self._successes >= self.limit:
+                self.limit += 1
+                self._successes = 0
+                self._cond.notify_all()
+
+    async def on_rate_limit(self, delay):
+        async with self._cond:
+            self.limit = max(1, self.limit // 2)
+            self._successes = 0
+            self.pause_until = max(self.pause_until, time.monotonic() + delay)
+            self._cond.notify_all()
+
+async def _acall_openai(aclient, limiter, prompt, stats):
+    """
+    Ein LLM-Call mit Retry. 429 respektiert Retry-After, sonst exponentielles Backoff mit Jitter.
+    Nach MAX_AI_RETRIES Versuchen -> QUESTIONABLE mit "AI Error" (landet in REJECTED, nicht stillschweigend NO).
+    """
+    for attempt in range(MAX_AI_RETRIES + 1):
+        await limiter.acquire()
+        t0 = time.perf_counter()
+        try:
+            res = await aclient.chat.completions.create(
+                model=OPENAI_MODEL,
+                messages=[{"role": "user", "content": prompt}],
+                response_format={"type": "json_object"}
+            )
+        except Exception as e:
+            await limiter.release()
+            _record_llm(t0, prompt, error=True)
+            if not _is_retryable(e) or attempt == MAX_AI_RETRIES:
+                stats["errors"] += 1
+                return _ai_error(e)
+
+            stats["retries"] += 1
+            metrics.RUN.add("llm", retries=1, rate_limited=int(isinstance(e, openai.RateLimitError)))
+            backoff = min(60.0, 2 ** attempt) + random.uniform(0, 1)
+            if isinstance(e, openai.RateLimitError):
+                stats["rate_limited"] += 1
+                delay = _retry_after(e)
+                await limiter.on_rate_limit(delay if delay is not None else backoff)
+            else:
+                await asyncio.sleep(_retry_after(e) or backoff)
+            continue
+
+        await limiter.release()
+        _record_llm(t0, prompt, res)
+        await limiter.on_success()
+        try:
+            return json.loads(res.choices[0].message.content)
+        except (ValueError, TypeError, AttributeError, IndexError) as e:
+            stats["errors"] += 1
+            return _ai_error(e)
+
+async def validate_batch_async(kind, items, concurrency=MAX_CONCURRENT_OPENAI_CALLS, aclient=None, on_result=None):
+    """
+    Validiert viele Kandidaten gleichzeitig.
+    items: Liste von (text, name). Ergebnis: Liste von Verdicts in derselben Reihenfolge.
+    on_result(index, verdict) wird für jedes Verdict aufgerufen, sobald es vorliegt (z.B. Run-Journal).
+    """
+    build_prompt = PROMPT_BUILDERS[kind]
+    own_client = aclient is None
+    if own_client:
+        aclient = make_async_client()
+
+    limiter = AdaptiveLimiter(concurrency)
+    stats = {"retries": 0, "rate_limited": 0, "errors": 0}
+    tiers = {"no_text": 0, "rules": 0, "no_hits": 0}
+
+    async def verdict(text, name):
+        text, local, tier = _prepare(kind, text)
+        if local is not None:
+            tiers[tier] += 1
+            return local
+
+        cache, key, cached = _cache_lookup(kind, text, name)
+        if cached is not None:
+            return cached
+
+        res = await _acall_openai(aclient, limiter, build_prompt(text, name), stats)
+        if cache is not None:
+            cache.put(key, res)
+        return res
+
+    async def one(i, text, name):
+        res = await verdict(text, name)
+        if on_result is not None:
+            on_result(i, res)
+        return res
+
+    try:
+        results = await asyncio.gather(*(one(i, text, name) for i, (text, name) in enumerate(items)))
+    finally:
+        if own_client:
+            await aclient.close()
+
+    if items:
+        local = sum(tiers.values())
+        print(f"   ⚡ Lokal entschieden: {local}/{len(items)} ({local / len(items):.0%}) – "
+              f"{tiers['rules']} per Regel, {tiers['no_hits']} ohne Treffer, {tiers['no_text']} ohne Text")
+    if stats["retries"] or stats["errors"]:
+        print(f"   ⚠️ LLM: {stats['rate_limited']}× Rate-Limit, {stats['retries']} Retries, {stats['errors']} Fehler")
+    return list(results)
+
+def validate_batch(kind, items, concurrency=MAX_CONCURRENT_OPENAI_CALLS, on_result=None):
+    """
+    Sync-Wrapper für validate_batch_async (läuft im Pipeline-Thread mit eigenem Event-Loop).
+    """
+    return asyncio.run(validate_batch_async(kind, items, concurrency, on_result=on_result))